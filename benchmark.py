@@ -0,0 +1,209 @@
+import contextlib
+import csv
+import datetime
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+
+import argparse
+
+import numpy as np
+
+import material_matrix
+import optimize_plan
+import optimize_sequence
+
+STAGES = ['bom_parse', 'common_analysis', 'matrix_build', 'solve', 'csv_write']
+
+def generate_bom(bom_path, item_list_path, num_items, materials_per_item, overlap,
+                 num_common=10, family_size=20, seed=0):
+    """
+    Writes a synthetic BOM.txt and item_list.txt in the Input/ formats.
+
+    Items come in families of family_size: a share `overlap` (0-1) of an item's
+    materials is drawn from its family's shared pool (twice materials_per_item codes),
+    the rest is used by that item only. Every item also uses num_common materials on
+    both layers (found by the common analysis). Materials are split randomly between
+    the Top (ST) and Bottom (SB) layers.
+    """
+    rng = random.Random(seed)
+    common = [f"C{m:06d}" for m in range(num_common)]
+    shared_count = round(overlap * materials_per_item)
+    pool_size = 2 * materials_per_item
+    next_unique = 0
+
+    with open(bom_path, 'w', newline='', encoding='utf-8-sig') as bom_file, \
+            open(item_list_path, 'w', newline='', encoding='utf-8-sig') as item_file:
+        bom = csv.writer(bom_file)
+        bom.writerow(['Item_Code', 'Material_Code', 'Qty', 'T_B', 'Package', 'Cell'])
+        items = csv.writer(item_file)
+        items.writerow(['Item_Code', 'T_B', 'Qty', 'Prod_Time'])
+
+        for n in range(num_items):
+            item = f"SYN{n:06d}A"
+            family = n // family_size
+            pool = [f"F{family:05d}-{m:04d}" for m in range(pool_size)]
+            materials = rng.sample(pool, min(shared_count, pool_size))
+            for _ in range(materials_per_item - len(materials)):
+                materials.append(f"U{next_unique:08d}")
+                next_unique += 1
+            for material in materials:
+                bom.writerow([item, material, rng.randint(1, 8), rng.choice(['SB', 'ST']), 'P0804', '1.0'])
+            for material in common:
+                for t_b in ('SB', 'ST'):
+                    bom.writerow([item, material, 1, t_b, 'P0804', '1.0'])
+
+            qty = rng.randint(50, 300)
+            for t_b in ('B', 'T'):
+                items.writerow([item, t_b, qty, round(qty * rng.uniform(0.2, 0.8), 1)])
+
+def sequence_changeover(sequence):
+    """Total material swaps between consecutive jobs (each line's sequence starts fresh)."""
+    total = 0
+    for prev, job in zip(sequence, sequence[1:]):
+        if not job.get('Is_Line_Start'):
+            total += len(prev['Individual_Set'] ^ job['Individual_Set'])
+    return total
+
+class StageTimer:
+    """Times named stages and, with trace_memory, records their peak traced allocation."""
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            result = {'seconds': round(seconds, 4)}
+            if self.trace_memory:
+                result['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+                tracemalloc.stop()
+            self.stages[name] = result
+
+def run_benchmark(work_dir, num_items, materials_per_item, overlap, settings_kwargs, layer_mode=None,
+                  num_common=10, family_size=20, coverage=1.0, seed=0, build_matrix=True,
+                  trace_memory=True, verbose=False):
+    """
+    Generates one synthetic instance in work_dir and runs the plan + sequence pipeline
+    on it stage by stage (see STAGES). Returns the report entry of the run.
+    """
+    bom_path = os.path.join(work_dir, "BOM.txt")
+    item_list_path = os.path.join(work_dir, "item_list.txt")
+    output_path = os.path.join(work_dir, "optimization_sequence.csv")
+    generate_bom(bom_path, item_list_path, num_items, materials_per_item, overlap,
+                 num_common=num_common, family_size=family_size, seed=seed)
+
+    timer = StageTimer(trace_memory)
+    # The pipeline's progress messages are dropped unless verbose
+    with contextlib.ExitStack() as stack:
+        if not verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        with timer.stage('bom_parse'):
+            item_layer_materials = optimize_plan.load_bom(bom_path)
+            prod_data = optimize_sequence.load_production_data(item_list_path)
+
+        with timer.stage('common_analysis'):
+            common_rows, _ = optimize_plan.extract_common_materials(item_layer_materials, coverage)
+            common_materials = {row['Common_Material_Code'] for row in common_rows}
+            results = optimize_plan.analyze_materials(item_layer_materials, common_materials, joined=False)
+            jobs = optimize_sequence.build_jobs(results, common_materials)
+            optimize_sequence.merge_production_data(jobs, prod_data)
+
+        if build_matrix:
+            # The full changeover matrix, as the matrix-based solvers build it per segment
+            with timer.stage('matrix_build'):
+                matrix = material_matrix.changeover_matrix([job['Individual_Set'] for job in jobs])
+            del matrix
+
+        settings = optimize_sequence.SolverSettings(**settings_kwargs)
+        with timer.stage('solve'):
+            sequence = optimize_sequence.sequence_jobs(jobs, [], layer_mode, settings=settings)
+
+        with timer.stage('csv_write'):
+            fieldnames, rows = optimize_sequence.build_result_rows(jobs, sequence)
+            with open(output_path, 'w', newline='', encoding='utf-8-sig') as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(rows)
+
+    return {
+        'params': {'items': num_items, 'materials_per_item': materials_per_item, 'overlap': overlap,
+                   'common': num_common, 'family_size': family_size, 'seed': seed, 'layer': layer_mode},
+        'jobs': len(jobs),
+        'materials': len({m for mats in item_layer_materials.values() for m in mats}),
+        'common_materials': len(common_materials),
+        'stages': timer.stages,
+        'total_seconds': round(sum(stage['seconds'] for stage in timer.stages.values()), 4),
+        'changeover': sequence_changeover(sequence),
+        'deferred': sum(1 for job in sequence if job.get('Is_Deferred')),
+    }
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (None where the resource module is missing)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KB on Linux, bytes on macOS
+    return round(peak / (2 ** 20 if platform.system() == 'Darwin' else 2 ** 10), 1)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the plan + sequence pipeline on synthetic BOMs.')
+    parser.add_argument('--items', type=str, default='100', help='Number of items, or a comma-separated list to run several sizes (e.g. "100,500,2000").')
+    parser.add_argument('--materials', type=int, default=40, help='Individual materials per item (both layers).')
+    parser.add_argument('--overlap', type=float, default=0.5, help='Share (0-1) of an item\'s materials drawn from its family\'s shared pool.')
+    parser.add_argument('--common', type=int, default=10, help='Materials used by every item (common parts).')
+    parser.add_argument('--family-size', type=int, default=20, help='Items per family sharing a material pool.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the generator.')
+    parser.add_argument('--layer', type=str, choices=['TB', 'BT'], help='Layer order passed to the sequencer.')
+    parser.add_argument('--solver', type=str, choices=optimize_sequence.SOLVERS, default='auto', help='Sequencing backend.')
+    parser.add_argument('--time-per-job', type=float, default=0.05, help='Solver seconds per job in a segment.')
+    parser.add_argument('--max-time', type=float, default=30.0, help='Maximum solver seconds for one segment.')
+    parser.add_argument('--cluster-size', type=int, help='Sequence segments larger than this hierarchically.')
+    parser.add_argument('--no-matrix', action='store_true', help='Skip the full changeover matrix stage (n x n memory).')
+    parser.add_argument('--no-trace-memory', action='store_true', help='Do not trace per-stage peak memory (tracemalloc slows Python-heavy stages).')
+    parser.add_argument('--verbose', action='store_true', help='Show the pipeline\'s progress messages.')
+    parser.add_argument('--report', type=str, default=os.path.join("Output", "benchmark_report.json"), help='JSON report path.')
+    args = parser.parse_args()
+
+    settings_kwargs = {'solver': args.solver, 'seconds_per_job': args.time_per_job,
+                       'max_seconds': args.max_time, 'cluster_size': args.cluster_size}
+    runs = []
+    for num_items in [int(x) for x in args.items.split(',') if x.strip()]:
+        print(f"Benchmarking {num_items} items x {args.materials} materials (overlap {args.overlap})...")
+        with tempfile.TemporaryDirectory() as work_dir:
+            run = run_benchmark(work_dir, num_items, args.materials, args.overlap, settings_kwargs,
+                                layer_mode=args.layer, num_common=args.common, family_size=args.family_size,
+                                seed=args.seed, build_matrix=not args.no_matrix,
+                                trace_memory=not args.no_trace_memory, verbose=args.verbose)
+        runs.append(run)
+        stages = ', '.join(f"{name} {stage['seconds']:.3f}s" for name, stage in run['stages'].items())
+        print(f"  {run['jobs']} jobs: {stages}; total {run['total_seconds']:.3f}s, changeover {run['changeover']}")
+
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'ortools': optimize_sequence.ORTOOLS_AVAILABLE,
+        'settings': settings_kwargs,
+        'peak_rss_mb': peak_rss_mb(),
+        'runs': runs,
+    }
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved benchmark report to: {args.report}")
+
+if __name__ == "__main__":
+    main()
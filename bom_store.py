@@ -0,0 +1,96 @@
+import os
+import pickle
+import sys
+
+import optimize_plan
+
+CACHE_FILE_NAME = ".bom_cache.pkl"
+CACHE_VERSION = 1
+
+class BomStore:
+    """
+    Serves parsed per-item BOMs (<bom_folder>/<Item_Code>.txt) from memory.
+
+    Each BOM file is parsed once into (Item_Code, Layer) -> frozenset of Material_Code
+    and kept in a pickle cache next to the BOM files. A cache entry is reused as long
+    as the file's mtime and size are unchanged.
+    """
+    def __init__(self, bom_folder, cache_path=None):
+        self.bom_folder = bom_folder
+        self.cache_path = cache_path or os.path.join(bom_folder, CACHE_FILE_NAME)
+        self._entries = {} # Item_Code -> (mtime_ns, size, {(Item_Code, Layer): frozenset})
+        self._dirty = False
+        self._load_cache()
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('version') == CACHE_VERSION:
+                self._entries = data.get('entries', {})
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable BOM cache {self.cache_path}: {e}")
+            self._entries = {}
+
+    def save(self):
+        """Writes the cache to disk if anything was (re)parsed since the last save."""
+        if not self._dirty:
+            return
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': CACHE_VERSION, 'entries': self._entries}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+            self._dirty = False
+        except OSError as e:
+            print(f"Warning: Could not save BOM cache {self.cache_path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get(self, item_code):
+        """
+        Returns (Item_Code, Layer) -> frozenset of Material_Code parsed from the item's
+        BOM file, or None if the file does not exist.
+        """
+        bom_file = os.path.join(self.bom_folder, f"{item_code}.txt")
+        try:
+            st = os.stat(bom_file)
+        except OSError:
+            if self._entries.pop(item_code, None) is not None:
+                self._dirty = True
+            return None
+
+        entry = self._entries.get(item_code)
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return entry[2]
+
+        parsed = optimize_plan.load_bom(bom_file)
+        materials = {key: frozenset(sys.intern(m) for m in mats) for key, mats in parsed.items()}
+        self._entries[item_code] = (st.st_mtime_ns, st.st_size, materials)
+        self._dirty = True
+        return materials
+
+    def load_items(self, item_codes):
+        """Returns (Item_Code, Layer) -> Set of Material_Code for the given items."""
+        item_layer_materials = {}
+        for item_code in sorted(set(item_codes)):
+            materials = self.get(item_code)
+            if not materials:
+                continue
+            for key, mats in materials.items():
+                if key not in item_layer_materials:
+                    item_layer_materials[key] = set()
+                item_layer_materials[key].update(mats)
+        return item_layer_materials
+
+_stores = {} # bom_folder -> BomStore (one per process)
+
+def get_bom_store(bom_folder):
+    """Returns the process-wide BomStore of a BOM folder."""
+    key = os.path.abspath(bom_folder)
+    if key not in _stores:
+        _stores[key] = BomStore(bom_folder)
+    return _stores[key]
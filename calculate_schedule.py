@@ -1,9 +1,13 @@
+import numpy as np
 import pandas as pd
 import argparse
+import math
 import os
 import sys
 import re
 
+import schedule_reader
+
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Calculate production schedule from Excel.')
     parser.add_argument('--file', type=str, required=True, help='Path to the schedule Excel file.')
@@ -11,49 +15,51 @@ def parse_arguments():
     parser.add_argument('--setup-times', type=str, default="", help='Setup times mapping (e.g. S01:40,S02:13)')
     return parser.parse_args()
 
-def calculate_time_for_row(row, target_qty, setup_time_map, line_col_idx):
+DEFAULT_SETUP_TIME = 13 # Minutes, for lines without a setup time
+STATIC_COLUMNS = (0, 2, 5, 8) # Item (A), Layer (C), T/T (F), Array (I) columns read by parse_row
+
+def find_line_column(columns):
+    """Index of the production line column (header containing 'line' or '생산라인'), or None."""
+    for i, col in enumerate(columns):
+        c_str = str(col).lower()
+        if "line" in c_str or "생산라인" in c_str:
+            return i
+    return None
+
+def static_columns(line_col_idx):
+    """Column indices parse_row reads (edits elsewhere do not change its result)."""
+    if line_col_idx is None:
+        return STATIC_COLUMNS
+    return STATIC_COLUMNS + (line_col_idx,)
+
+def parse_row(values, line_col_idx):
     """
-    Calculates production time based on formula and line-specific setup time.
+    Parses the static (quantity-independent) columns of a schedule row.
+    values: the row's cell values in column order.
+    Returns a dict with Item_Code, Layers, B_Cycle, T_Cycle, Array_Count and Line,
+    or None when the row cannot be produced (no item, array count or cycle time).
     """
-    item_code = str(row.iloc[0]).strip() # Col A
-    layer_info = str(row.iloc[2]).strip() # Col C
-    tt_info = str(row.iloc[5]).strip()    # Col F
-    array_val = row.iloc[8]               # Col I
+    item_code = str(values[0]).strip() # Col A
+    layer_info = str(values[2]).strip() # Col C
+    tt_info = str(values[5]).strip()    # Col F
+    array_val = values[8]               # Col I
     
     # Get Line Info
     line_val = "Unknown"
-    if line_col_idx is not None and line_col_idx < len(row):
-        val = str(row.iloc[line_col_idx]).strip()
+    if line_col_idx is not None and line_col_idx < len(values):
+        val = str(values[line_col_idx]).strip()
         if val and val != 'nan':
             line_val = val
-            
-    # Determine Setup Time
-    # Default 13
-    setup_time = 13
-    if line_val in setup_time_map:
-        setup_time = setup_time_map[line_val]
     
     # Validation
-    if pd.isna(item_code) or item_code == 'nan' or not item_code:
-        return []
+    if item_code == 'nan' or not item_code:
+        return None
     
-    try:
-        # Extract number from string like "(적층) 1"
-        s_val = str(array_val)
-        match = re.search(r"(\d+(\.\d+)?)", s_val)
-        if match:
-            array_count = float(match.group(1))
-        else:
-            return []
-    except (ValueError, TypeError):
-        return []
-        
-    try:
-        qty = float(target_qty)
-        if qty <= 0:
-            return []
-    except (ValueError, TypeError):
-        return []
+    # Extract number from string like "(적층) 1"
+    match = re.search(r"(\d+(\.\d+)?)", str(array_val))
+    if not match:
+        return None
+    array_count = float(match.group(1))
 
     # Parse Layer
     layers = []
@@ -73,9 +79,6 @@ def calculate_time_for_row(row, target_qty, setup_time_map, line_col_idx):
     b_cycle = 0.0
     t_cycle = 0.0
     
-    # Clean and split
-    tt_clean = tt_info.replace(' ', '')
-    
     if ',' in tt_info:
         parts = tt_info.split(',')
         try:
@@ -97,39 +100,103 @@ def calculate_time_for_row(row, target_qty, setup_time_map, line_col_idx):
             t_cycle = val
         except:
             pass # 0.0
+
+    # Empty T/T cells read as "nan"
+    b_cycle = 0.0 if math.isnan(b_cycle) else b_cycle
+    t_cycle = 0.0 if math.isnan(t_cycle) else t_cycle
             
     if b_cycle == 0 and t_cycle == 0:
+        return None
+
+    return {
+        'Item_Code': item_code,
+        'Layers': std_layers,
+        'B_Cycle': b_cycle,
+        'T_Cycle': t_cycle,
+        'Array_Count': array_count,
+        'Line': line_val
+    }
+
+def layer_cycles(parsed):
+    """(layer, cycle time) of each layer of a parsed row that takes time."""
+    cycles = []
+    for layer_name in parsed['Layers']:
+        # Unknown layers fall back to B (first val)
+        c_time = parsed['T_Cycle'] if layer_name == 'Top' else parsed['B_Cycle']
+        if c_time > 0:
+            cycles.append((layer_name, c_time))
+    return cycles
+
+def row_production(parsed, target_qty, setup_time_map):
+    """Production results (one per layer) of a parsed row for a quantity."""
+    try:
+        qty = float(target_qty)
+        if qty <= 0:
+            return []
+    except (ValueError, TypeError):
         return []
 
+    setup_time = setup_time_map.get(parsed['Line'], DEFAULT_SETUP_TIME)
     results = []
-    
-    def add_result(l_name, c_time):
-        if c_time <= 0: return # Skip if no time
-        
+    for layer_name, c_time in layer_cycles(parsed):
         # Formula: (TT * Array * Qty) / 60 + SetupTime
-        prod_time_mins = ((c_time * array_count * qty) / 60) + setup_time
+        prod_time_mins = ((c_time * parsed['Array_Count'] * qty) / 60) + setup_time
         results.append({
-            'Item_Code': item_code,
-            'Layer': l_name,
+            'Item_Code': parsed['Item_Code'],
+            'Layer': layer_name,
             'Qty': int(qty),
             'Cycle_Time': c_time,
-            'Line': line_val,
+            'Line': parsed['Line'],
             'Setup_Time': setup_time,
             'Prod_Time': round(prod_time_mins, 2)
         })
-
-    for layer_name in std_layers:
-        if layer_name == 'Bottom':
-            add_result(layer_name, b_cycle)
-        elif layer_name == 'Top':
-            add_result(layer_name, t_cycle)
-        else:
-            # Unknown layer? Use B cycle or T?
-            # Fallback to B (first val)
-            add_result(layer_name, b_cycle)
-            
     return results
 
+def calculate_time_for_row(row, target_qty, setup_time_map, line_col_idx):
+    """
+    Calculates production time based on formula and line-specific setup time.
+    """
+    parsed = parse_row(row.tolist(), line_col_idx)
+    if parsed is None:
+        return []
+    return row_production(parsed, target_qty, setup_time_map)
+
+def schedule_quantities(df, date_cols):
+    """Quantities of the date columns as a (rows, dates) float array (NaN where not a number)."""
+    qty = df.iloc[:, list(date_cols)].apply(pd.to_numeric, errors='coerce')
+    return qty.to_numpy(dtype=float)
+
+def line_date_totals(parsed_rows, qty, setup_time_map):
+    """
+    Total Prod_Time per line and date of a whole schedule, vectorized: every layer of
+    every parsed row (None rows are skipped) is one entry, its time for all dates is
+    computed at once by broadcasting against the quantity array, and the entries are
+    grouped by line.
+    qty: (rows, dates) array from schedule_quantities.
+    Returns a DataFrame indexed by line with one column per date (positions in qty).
+    """
+    rows, cycles, array_counts, setups, lines = [], [], [], [], []
+    for r_idx, parsed in enumerate(parsed_rows):
+        if parsed is None:
+            continue
+        setup_time = setup_time_map.get(parsed['Line'], DEFAULT_SETUP_TIME)
+        for _, c_time in layer_cycles(parsed):
+            rows.append(r_idx)
+            cycles.append(c_time)
+            array_counts.append(parsed['Array_Count'])
+            setups.append(setup_time)
+            lines.append(parsed['Line'])
+
+    num_dates = qty.shape[1]
+    if not rows:
+        return pd.DataFrame(columns=range(num_dates), dtype=float)
+
+    entry_qty = qty[rows]
+    rate = (np.array(cycles) * np.array(array_counts))[:, None]
+    times = np.round(rate * entry_qty / 60 + np.array(setups, dtype=float)[:, None], 2)
+    times[~(entry_qty > 0)] = 0.0 # NaN or non-positive quantities are not produced
+    return pd.DataFrame(times, columns=range(num_dates)).groupby(np.array(lines)).sum()
+
 def main():
     args = parse_arguments()
     
@@ -140,38 +207,22 @@ def main():
     print(f"Loading schedule from {args.file}...")
     
     try:
-        # Load Excel, header is at row 37 (index 36)
-        # Verify if row 37 is indeed the header or if we just start reading data from there?
-        # User: "엑셀 파일의 37번행에 ... 정보가 입력되어 있고" -> This usually means Row 37 is the Header.
-        df = pd.read_excel(args.file, header=36) 
+        # Header at row 37 (index 36) when it names the Item / Code columns; one streaming pass
+        df, date_cols = schedule_reader.read_schedule(args.file)
     except Exception as e:
         print(f"Error reading Excel file: {e}")
         sys.exit(1)
 
-    # Clean columns check
-    # We need to find the column for the specific date.
-    # The user says "J열부터는 날짜별...". J is index 9 (0-based A=0).
-    
+    # Date columns are named YYYY-MM-DD (J열부터 날짜별 수량)
     target_col = None
-    
-    # Look for the date column
-    # The header might comprise dates. We need to match string representation.
-    # Check if args.date is in columns
-    
-    # Convert args.date to datetime if columns are datetime objects?
-    # Or simple string match.
-    
-    found_col = False
-    for col in df.columns:
-        col_str = str(col).split(' ')[0] # Handle timestamps "2024-01-01 00:00:00"
-        if args.date in col_str:
-            target_col = col
-            found_col = True
+    for col_idx in date_cols:
+        if args.date in str(df.columns[col_idx]):
+            target_col = df.columns[col_idx]
             break
             
-    if not found_col:
+    if target_col is None:
         print(f"Error: Could not find column for date {args.date} in Excel header.")
-        print("Available columns (sample):", list(df.columns)[9:15]) # Show some date columns
+        print("Available columns (sample):", [df.columns[i] for i in date_cols[:6]]) # Show some date columns
         sys.exit(1)
         
     print(f"Found target date column: {target_col}")
@@ -190,12 +241,7 @@ def main():
             print(f"Error parsing setup times: {e}")
 
     # Find Line Column
-    line_col_idx = None
-    for i, col in enumerate(df.columns):
-        c_str = str(col).lower()
-        if "line" in c_str or "생산라인" in c_str:
-            line_col_idx = i
-            break
+    line_col_idx = find_line_column(df.columns)
             
     print(f"Found Line Column Index: {line_col_idx} (Name: {df.columns[line_col_idx] if line_col_idx is not None else 'None'})")
 
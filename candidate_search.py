@@ -0,0 +1,178 @@
+import time
+
+import numpy as np
+
+import material_matrix
+import minhash
+
+NEIGHBOURS = 8 # Candidate list length per job
+DEPOT = -1
+END = -2
+
+class ChangeoverOracle:
+    """
+    Changeover cost between two jobs, computed on demand from bit-packed material sets
+    (no n x n matrix). DEPOT is the start (reference set, or free without one) and END
+    the free end of the open path.
+    """
+    def __init__(self, material_sets, start_ref_set=None):
+        sets = list(material_sets)
+        if start_ref_set is not None:
+            sets.append(start_ref_set)
+        self.packed, _ = material_matrix.pack_sets(sets)
+        self.sets = [frozenset(s) for s in sets] # Single arcs: set arithmetic beats a NumPy call
+        self.num_jobs = len(material_sets)
+        self.has_ref = start_ref_set is not None
+
+    def many(self, a, bs):
+        """Costs from job (or DEPOT) a to each job in bs."""
+        bs = np.asarray(bs, dtype=np.int64)
+        if a == DEPOT:
+            if not self.has_ref:
+                return np.zeros(len(bs), dtype=np.int64)
+            a = self.num_jobs
+        return material_matrix.popcount(self.packed[bs] ^ self.packed[a])
+
+    def __call__(self, a, b):
+        if b == END or (a == DEPOT and not self.has_ref):
+            return 0
+        if a == END or b == DEPOT:
+            raise ValueError("Invalid arc")
+        if a == DEPOT:
+            a = self.num_jobs
+        return len(self.sets[a] ^ self.sets[b])
+
+def candidate_lists(material_sets, cost, neighbours=NEIGHBOURS):
+    """
+    The `neighbours` cheapest jobs of every job among its approximate nearest
+    neighbours from a MinHash LSH index. Returns (index, list of arrays).
+    """
+    sigs = minhash.signatures(material_sets)
+    index = minhash.LSHIndex(sigs)
+    lists = []
+    for i in range(len(material_sets)):
+        found = index.query(sigs[i], 4 * neighbours + 1)
+        found = found[found != i]
+        if len(found):
+            found = found[np.argsort(cost.many(i, found), kind='stable')[:neighbours]]
+        lists.append(found)
+    return index, lists
+
+def construct_path(material_sets, cost, index, lists):
+    """
+    Nearest-neighbour construction driven by the candidate lists: the next job is the
+    cheapest unvisited candidate of the current one, else the cheapest of an LSH query
+    over the unvisited jobs, else the most similar unvisited job by signature.
+    Returns the job order.
+    """
+    n = len(material_sets)
+    visited = np.zeros(n, dtype=bool)
+    if cost.has_ref:
+        current = int(np.argmin(cost.many(DEPOT, np.arange(n))))
+    else:
+        current = 0
+    path = [current]
+    visited[current] = True
+    for _ in range(n - 1):
+        found = lists[current][~visited[lists[current]]]
+        if not len(found):
+            found = index.query(index.sigs[current], 4 * NEIGHBOURS, exclude=visited)
+        if not len(found):
+            unvisited = np.flatnonzero(~visited)
+            sims = minhash.similarity(index.sigs, current, unvisited)
+            found = unvisited[np.argsort(-sims, kind='stable')[:4 * NEIGHBOURS]]
+        current = int(found[np.argmin(cost.many(current, found))])
+        path.append(current)
+        visited[current] = True
+    return path
+
+def or_opt_candidates(path, cost, lists, deadline):
+    """
+    One sweep of Or-opt restricted to candidate lists: each segment of 1-3 jobs is moved
+    (as is or reversed) next to one of its end jobs' candidate neighbours when that
+    lowers the cost. Modifies path in place; returns True if it improved.
+    """
+    improved = False
+    position = {job: k for k, job in enumerate(path)}
+    for seg_len in (1, 2, 3):
+        i = 0
+        while i + seg_len <= len(path):
+            if time.monotonic() >= deadline:
+                return improved
+            seg = path[i:i + seg_len]
+            prev = path[i - 1] if i > 0 else DEPOT
+            nxt = path[i + seg_len] if i + seg_len < len(path) else END
+            removal_gain = cost(prev, seg[0]) + cost(seg[-1], nxt) - cost(prev, nxt)
+
+            def rest_at(g):
+                # Job at position g of the path without the segment
+                return path[g] if g < i else path[g + seg_len]
+
+            rest_len = len(path) - seg_len
+            best = (0, None, None)
+            for c in set(lists[seg[0]].tolist()) | set(lists[seg[-1]].tolist()):
+                k = position[c]
+                if i <= k < i + seg_len:
+                    continue
+                if k > i:
+                    k -= seg_len
+                # Gaps next to c: (rest[k-1], c) and (c, rest[k+1])
+                for gap in (k, k + 1):
+                    u = rest_at(gap - 1) if gap > 0 else DEPOT
+                    v = rest_at(gap) if gap < rest_len else END
+                    base = cost(u, v)
+                    for s in (seg, seg[::-1]):
+                        delta = cost(u, s[0]) + cost(s[-1], v) - base - removal_gain
+                        if delta < best[0]:
+                            best = (delta, gap, s)
+            if best[1] is not None:
+                rest = path[:i] + path[i + seg_len:]
+                path[:] = rest[:best[1]] + best[2] + rest[best[1]:]
+                position = {job: k for k, job in enumerate(path)}
+                improved = True
+            else:
+                i += 1
+    return improved
+
+def two_opt_candidates(path, cost, lists, deadline):
+    """
+    One sweep of 2-opt restricted to candidate lists: for each arc (a, b) and each
+    candidate c of a further along the path, reverses b..c when the new arcs (a, c) and
+    (b, after c) are cheaper. Modifies path in place; returns True if it improved.
+    """
+    improved = False
+    position = {job: k for k, job in enumerate(path)}
+    for i in range(1, len(path)):
+        if time.monotonic() >= deadline:
+            break
+        a, b = path[i - 1], path[i]
+        for c in lists[a].tolist():
+            j = position[c]
+            if j <= i:
+                continue
+            d = path[j + 1] if j + 1 < len(path) else END
+            if cost(a, c) + cost(b, d) < cost(a, b) + cost(c, d):
+                path[i:j + 1] = path[i:j + 1][::-1]
+                position.update((job, k) for k, job in enumerate(path[i:j + 1], start=i))
+                improved = True
+                break
+    return improved
+
+def solve_candidates(material_sets, start_ref_set, settings):
+    """
+    Matrix-free sequencing for large instances: candidate lists from a MinHash LSH index
+    drive a nearest-neighbour construction and 2-opt / Or-opt moves that only consider
+    arcs to candidate neighbours, until no move improves or the time limit is reached.
+    Costs are computed on demand, so memory stays linear in the number of jobs.
+    Returns the job order.
+    """
+    deadline = time.monotonic() + settings.time_limit(len(material_sets))
+    cost = ChangeoverOracle(material_sets, start_ref_set)
+    index, lists = candidate_lists(material_sets, cost)
+    path = construct_path(material_sets, cost, index, lists)
+
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = two_opt_candidates(path, cost, lists, deadline)
+        improved = or_opt_candidates(path, cost, lists, deadline) or improved
+    return path
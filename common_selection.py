@@ -0,0 +1,64 @@
+import math
+
+import numpy as np
+
+import material_matrix
+import optimize_sequence
+
+PROPOSAL_FIELDS = ['Material_Code', 'Source', 'Swap_Savings']
+
+def swap_counts(usage, order):
+    """
+    Number of changeovers each material causes along a job order: consecutive job pairs
+    (rows of the UsageMatrix) where exactly one of the two uses it.
+    """
+    rows = [usage.indices[usage.indptr[r]:usage.indptr[r + 1]] for r in order]
+    swapped = [np.setxor1d(a, b, assume_unique=True) for a, b in zip(rows, rows[1:])]
+    if not swapped:
+        return np.zeros(usage.num_materials, dtype=np.int64)
+    return np.bincount(np.concatenate(swapped).astype(np.int64), minlength=usage.num_materials)
+
+def sequence_cost(jobs, settings):
+    """Optimized order of the jobs and its total changeover count."""
+    order = optimize_sequence.solve_tsp(jobs, None, settings)
+    sets = [jobs[i]['Individual_Set'] for i in order]
+    return order, sum(len(a ^ b) for a, b in zip(sets, sets[1:]))
+
+def select_common_materials(item_layer_materials, common_materials, slots, rounds=4, settings=None):
+    """
+    Picks up to `slots` more materials to load permanently (common) so that the total
+    changeover of the planned jobs (item-layers) is smallest.
+
+    Greedy marginal gain: along the current optimized order, a material's gain is the
+    number of changeovers it causes; the best ones are taken a share of the slots at a
+    time (rounds), and the jobs are re-sequenced without them before the next pick.
+
+    Returns (list of (Material_Code, gain when picked), changeovers before, after).
+    """
+    if settings is None:
+        settings = optimize_sequence.SolverSettings(max_seconds=5.0)
+    keys = sorted(item_layer_materials)
+    individual = [set(item_layer_materials[key]) - set(common_materials) for key in keys]
+    usage = material_matrix.UsageMatrix(individual)
+    jobs = [{'Item_Code': item, 'Layer': layer, 'Individual_Set': mats}
+            for (item, layer), mats in zip(keys, individual)]
+
+    order, before = sequence_cost(jobs, settings)
+    after = before
+    chosen = []
+    per_round = max(1, math.ceil(slots / rounds))
+    while len(chosen) < slots:
+        counts = swap_counts(usage, order)
+        counts[[usage.index.ids[code] for code, _ in chosen]] = 0
+        ranked = [m for m in np.argsort(-counts, kind='stable') if counts[m] > 0]
+        if not ranked:
+            break
+        for m in ranked[:min(per_round, slots - len(chosen))]:
+            chosen.append((usage.index.codes[m], int(counts[m])))
+
+        picked = {code for code, _ in chosen}
+        for job, mats in zip(jobs, individual):
+            job['Individual_Set'] = mats - picked
+        order, after = sequence_cost(jobs, settings)
+
+    return chosen, before, after
@@ -0,0 +1,278 @@
+import bisect
+import heapq
+import time
+
+DEFAULT_LINE = "Unknown"
+
+DEFAULT_SLOTS_KEY = "*"
+
+def parse_feeder_slots(text):
+    """
+    Parses a feeder slot setting: a single count for every line ("120") or a per-line
+    mapping ("S01:120,S02:100"). In a mapping, "*:COUNT" is the count of the lines not
+    listed; without it every line of the sequence must be listed (see slots_for_line).
+    Counts must be positive. Returns an int, a dict Line -> int, or None if empty.
+    Raises ValueError on a malformed setting.
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    if ':' not in text:
+        return parse_slot_count(text, text)
+    slots = {}
+    for pair in text.split(','):
+        if not pair.strip():
+            continue
+        parts = pair.split(':')
+        if len(parts) != 2 or not parts[0].strip():
+            raise ValueError(f"Invalid feeder slot entry {pair.strip()!r}, expected LINE:COUNT")
+        slots[parts[0].strip()] = parse_slot_count(parts[1], pair.strip())
+    return slots
+
+def parse_slot_count(text, entry):
+    try:
+        count = int(text.strip())
+    except ValueError:
+        count = 0
+    if count <= 0:
+        raise ValueError(f"Invalid feeder slot entry {entry!r}, expected a positive slot count")
+    return count
+
+def slots_for_line(feeder_slots, line):
+    """
+    Slot count of a line (feeder_slots is an int or a dict Line -> int, whose "*" entry
+    covers the lines not listed). Raises ValueError for a line the mapping does not cover.
+    """
+    if isinstance(feeder_slots, dict):
+        if line in feeder_slots:
+            return feeder_slots[line]
+        if DEFAULT_SLOTS_KEY in feeder_slots:
+            return feeder_slots[DEFAULT_SLOTS_KEY]
+        raise ValueError(f"No feeder slot count for line '{line}' (add '{line}:COUNT' or '*:COUNT' to the feeder slots).")
+    return feeder_slots
+
+def feeder_step(loaded, mats, slots, next_use):
+    """
+    Loads one job's materials into the loaded set (in place), unloading the materials
+    with the furthest next use (next_use: loaded material -> position of its next job;
+    ties by material code, so that the result does not depend on set order) when the
+    bank is full.
+    Returns (loads, unloads) of the job.
+    """
+    missing = mats - loaded
+    overflow = len(loaded) + len(missing) - max(slots, len(mats))
+    evicted = 0
+    if overflow > 0:
+        candidates = heapq.nlargest(overflow, [(next_use[m], m) for m in loaded - mats])
+        for _, m in candidates:
+            loaded.discard(m)
+        evicted = len(candidates)
+    loaded |= missing
+    return len(missing), evicted
+
+def material_positions(material_sets):
+    """Material -> ascending positions of the jobs using it."""
+    positions = {}
+    for pos, mats in enumerate(material_sets):
+        for m in mats:
+            positions.setdefault(m, []).append(pos)
+    return positions
+
+def next_position(positions, m, pos, end):
+    """First position after pos using material m, or end."""
+    uses = positions[m]
+    k = bisect.bisect_right(uses, pos)
+    return uses[k] if k < len(uses) else end
+
+def simulate_feeder(material_sets, slots):
+    """
+    Simulates the feeder bank of one line along a sequence of jobs.
+
+    Every material of a job must be loaded while it runs. Materials stay loaded after the
+    job; when the bank is full, the loaded materials whose next use is furthest away
+    (never used again first) are unloaded. A job needing more materials than there are
+    slots temporarily extends the bank.
+
+    Returns (loads, unloads): the number of materials loaded / unloaded before each job.
+    """
+    positions = material_positions(material_sets)
+    loaded = set()
+    next_use = {}
+    loads = []
+    unloads = []
+    for pos, mats in enumerate(material_sets):
+        count, evicted = feeder_step(loaded, mats, slots, next_use)
+        for m in mats:
+            next_use[m] = next_position(positions, m, pos, len(material_sets))
+        loads.append(count)
+        unloads.append(evicted)
+    return loads, unloads
+
+class LineFeeder:
+    """
+    Feeder simulation of one line's job sequence that keeps the bank before every job,
+    so that a moved job is re-simulated only from the first unload decision it can
+    change until the bank matches the original one again (the rest is then unchanged).
+    Unloads rank materials by next use, which a move shifts uniformly for the jobs it
+    passes: only the next uses of the moved job's materials change their ranking.
+    """
+    def __init__(self, material_sets, slots):
+        self.sets = list(material_sets)
+        self.slots = slots
+        self.positions = material_positions(self.sets)
+        self.banks = [] # Loaded materials before each job
+        self.prefix = [0] # Loads before each job (cumulative)
+        self.unload_positions = [] # Jobs before which materials are unloaded
+        loaded = set()
+        next_use = {}
+        for pos, mats in enumerate(self.sets):
+            self.banks.append(frozenset(loaded))
+            count, evicted = feeder_step(loaded, mats, slots, next_use)
+            for m in mats:
+                next_use[m] = self.next_use(m, pos)
+            self.prefix.append(self.prefix[-1] + count)
+            if evicted:
+                self.unload_positions.append(pos)
+
+    @property
+    def total(self):
+        return self.prefix[-1]
+
+    def next_use(self, m, pos):
+        return next_position(self.positions, m, pos, len(self.sets))
+
+    def move_cost(self, a, b, horizon=None):
+        """
+        Total loads of the line with its job at position a moved to position b.
+        horizon: only estimate it, re-simulating from the bank before the move to horizon
+                 jobs after it (the rest is assumed unchanged), to screen moves cheaply.
+        """
+        lo, hi = min(a, b), max(a, b)
+        moved = self.sets[lo:hi + 1]
+        moved = moved[1:] + moved[:1] if a < b else moved[-1:] + moved[:-1]
+
+        def moved_next_use(m, pos):
+            if pos < lo:
+                k = self.next_use(m, pos)
+                if k < lo:
+                    return k
+                pos = lo - 1
+            for k in range(pos + 1, hi + 1):
+                if m in moved[k - lo]:
+                    return k
+            return self.next_use(m, hi)
+
+        # The first unload after the last use before lo of a material of the moved job
+        # ranks its changed next use: the exact simulation restarts there
+        start = lo
+        if horizon is None:
+            for m in self.sets[a]:
+                uses = self.positions[m]
+                k = bisect.bisect_left(uses, lo)
+                if k:
+                    u = bisect.bisect_right(self.unload_positions, uses[k - 1])
+                    if u < len(self.unload_positions):
+                        start = min(start, self.unload_positions[u])
+
+        loaded = set(self.banks[start])
+        next_use = {m: moved_next_use(m, start - 1) for m in loaded}
+        total = self.prefix[start]
+        end = len(self.sets) if horizon is None else min(len(self.sets), hi + 1 + horizon)
+        for pos in range(start, end):
+            if pos <= hi:
+                mats = moved[pos - lo] if pos >= lo else self.sets[pos]
+                count, _ = feeder_step(loaded, mats, self.slots, next_use)
+                for m in mats:
+                    next_use[m] = moved_next_use(m, pos)
+            elif loaded == self.banks[pos]:
+                return total + self.total - self.prefix[pos]
+            else:
+                mats = self.sets[pos]
+                count, _ = feeder_step(loaded, mats, self.slots, next_use)
+                for m in mats:
+                    next_use[m] = self.next_use(m, pos)
+            total += count
+        return total + self.total - self.prefix[end]
+
+def job_line(job):
+    return job.get('Line') or DEFAULT_LINE
+
+def sequence_feeder_cost(sequence, feeder_slots):
+    """
+    Total materials loaded along a job sequence. Jobs of each line (job['Line']) are
+    simulated on that line's feeder bank, in their order within the sequence.
+    """
+    by_line = {}
+    for job in sequence:
+        by_line.setdefault(job_line(job), []).append(job['Individual_Set'])
+    return sum(sum(simulate_feeder(sets, slots_for_line(feeder_slots, line))[0])
+               for line, sets in by_line.items())
+
+def annotate_feeder_loads(sequence, feeder_slots):
+    """Stores the simulated per-job load count in job['Feeder_Loads']."""
+    by_line = {}
+    for job in sequence:
+        by_line.setdefault(job_line(job), []).append(job)
+    for line, line_jobs in by_line.items():
+        loads, _ = simulate_feeder([job['Individual_Set'] for job in line_jobs],
+                                   slots_for_line(feeder_slots, line))
+        for job, count in zip(line_jobs, loads):
+            job['Feeder_Loads'] = count
+
+def improve_feeder_sequence(sequence, feeder_slots, block_keys=None, time_limit=1.0, window=8):
+    """
+    Local search on the simulated feeder cost: relocates single jobs up to `window`
+    positions away, keeping every job inside its block (consecutive jobs with the same
+    block key, e.g. the priority/layer stage), and keeps a move when it reduces the
+    total loads. A move only changes the order of its job's line, which is re-simulated
+    incrementally (LineFeeder.move_cost): moves are first screened on the jobs around
+    them, and once no screened move improves, evaluated exactly. Stops when no move
+    improves or time_limit seconds have passed.
+    Returns the improved sequence (a new list).
+    """
+    sequence = list(sequence)
+    if len(sequence) < 3:
+        return sequence
+    block_keys = [0] * len(sequence) if block_keys is None else list(block_keys)
+
+    def line_positions():
+        positions = {}
+        for pos, job in enumerate(sequence):
+            positions.setdefault(job_line(job), []).append(pos)
+        return positions
+
+    def line_feeder(line):
+        return LineFeeder([sequence[pos]['Individual_Set'] for pos in positions[line]],
+                          slots_for_line(feeder_slots, line))
+
+    positions = line_positions()
+    feeders = {line: line_feeder(line) for line in positions}
+
+    deadline = time.monotonic() + time_limit
+    # Screened passes first; exact ones then find the moves the screening misses
+    for horizon in (window, None):
+        improved = True
+        while improved and time.monotonic() < deadline:
+            improved = False
+            for i in range(len(sequence)):
+                if time.monotonic() >= deadline:
+                    break
+                line = job_line(sequence[i])
+                feeder = feeders[line]
+                a = bisect.bisect_left(positions[line], i)
+                for j in range(max(0, i - window), min(len(sequence), i + window + 1)):
+                    lo, hi = min(i, j), max(i, j)
+                    if j == i or any(key != block_keys[i] for key in block_keys[lo:hi + 1]):
+                        continue
+                    # Position of the job in its line's order once moved to j
+                    b = bisect.bisect_right(positions[line], j) - 1 if j > i else bisect.bisect_left(positions[line], j)
+                    if (b == a or feeder.move_cost(a, b, horizon) >= feeder.total
+                            or (horizon is not None and feeder.move_cost(a, b) >= feeder.total)):
+                        continue
+                    sequence.insert(j, sequence.pop(i))
+                    block_keys.insert(j, block_keys.pop(i))
+                    positions = line_positions()
+                    feeders[line] = line_feeder(line)
+                    improved = True
+                    break
+    return sequence
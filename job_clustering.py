@@ -0,0 +1,110 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import material_matrix
+import minhash
+
+def cluster_jobs(material_sets, cluster_size):
+    """
+    Groups jobs with similar material sets into clusters of at most cluster_size jobs:
+    the first unassigned job seeds a cluster that takes the unassigned jobs with the
+    highest estimated (MinHash) Jaccard similarity to it.
+    Returns a list of clusters (lists of job indices).
+    """
+    sigs = minhash.signatures(material_sets)
+    unassigned = np.arange(len(material_sets))
+    clusters = []
+    while len(unassigned):
+        seed, rest = unassigned[0], unassigned[1:]
+        sims = minhash.similarity(sigs, seed, rest)
+        nearest = np.argsort(-sims, kind='stable')[:cluster_size - 1]
+        clusters.append([int(seed)] + [int(i) for i in rest[nearest]])
+        unassigned = np.delete(rest, nearest)
+    return clusters
+
+def solve_cluster(cluster_jobs, settings):
+    """Sequences one cluster on its own (top-level so it can run in a worker process)."""
+    import optimize_sequence
+    return optimize_sequence.solve_tsp(cluster_jobs, None, settings)
+
+def orient_paths(paths, end_dist, has_ref=False):
+    """
+    Chooses for each path (in the given order) whether to run it forward or reversed so
+    that the changeovers between consecutive paths (and from the reference set into the
+    first one) are smallest: exact DP over the two orientations of every path.
+    end_dist: changeovers between the endpoints; rows 2p / 2p + 1 are the first / last
+              job of path p, and the last row is the reference set when has_ref.
+    Returns the stitched job order.
+    """
+    def entry(p, r):
+        return 2 * p + r
+
+    def exit_(p, r):
+        return 2 * p + 1 - r
+
+    # cost[r]: best stitched cost so far with the current path oriented r (0 forward, 1 reversed)
+    cost = [end_dist[-1, entry(0, r)] if has_ref else 0 for r in (0, 1)]
+    choice = []
+    for p in range(1, len(paths)):
+        new_cost = []
+        back = []
+        for r in (0, 1):
+            options = [cost[q] + end_dist[exit_(p - 1, q), entry(p, r)] for q in (0, 1)]
+            q = int(np.argmin(options))
+            new_cost.append(options[q])
+            back.append(q)
+        cost = new_cost
+        choice.append(back)
+
+    orientation = [int(np.argmin(cost))]
+    for back in reversed(choice):
+        orientation.append(back[orientation[-1]])
+    orientation.reverse()
+
+    order = []
+    for path, r in zip(paths, orientation):
+        order.extend(reversed(path) if r else path)
+    return order
+
+def solve_clustered(jobs, start_ref_job, settings):
+    """
+    Hierarchical sequencing for large job lists: clusters similar jobs (cluster_jobs),
+    sequences every cluster on its own (in settings.cluster_workers processes), orders
+    the clusters by the cheapest changeover between their endpoints, and stitches the
+    boundaries by orienting each cluster path (orient_paths).
+    No matrix over all jobs is built. Returns the job order.
+    """
+    import optimize_sequence
+
+    material_sets = [job['Individual_Set'] for job in jobs]
+    clusters = cluster_jobs(material_sets, settings.cluster_size)
+    print(f"Clustered {len(jobs)} jobs into {len(clusters)} clusters.")
+
+    # Clusters are solved flat (no nested clustering), with the lean job fields they need
+    cluster_settings = settings.flat()
+    tasks = [[{'Item_Code': jobs[i].get('Item_Code'), 'Layer': jobs[i].get('Layer'),
+               'Individual_Set': material_sets[i]} for i in cluster] for cluster in clusters]
+    if settings.cluster_workers > 1 and len(clusters) > 1:
+        with ProcessPoolExecutor(max_workers=min(settings.cluster_workers, len(clusters))) as pool:
+            local_orders = list(pool.map(solve_cluster, tasks, [cluster_settings] * len(tasks)))
+    else:
+        local_orders = [solve_cluster(task, cluster_settings) for task in tasks]
+    paths = [[cluster[i] for i in order] for cluster, order in zip(clusters, local_orders)]
+
+    # Order the clusters: cost between clusters = cheapest pair of their endpoints
+    num = len(paths)
+    endpoint_sets = [material_sets[i] for path in paths for i in (path[0], path[-1])]
+    if start_ref_job is not None:
+        endpoint_sets.append(start_ref_job['Individual_Set'])
+    packed, _ = material_matrix.pack_sets(endpoint_sets)
+    end_dist = material_matrix.pairwise_xor_counts(packed, packed)
+    cluster_matrix = np.zeros((num + 1, num + 1), dtype=np.int64)
+    cluster_matrix[1:, 1:] = end_dist[:2 * num, :2 * num].reshape(num, 2, num, 2).min(axis=(1, 3))
+    if start_ref_job is not None:
+        cluster_matrix[0, 1:] = end_dist[2 * num, :2 * num].reshape(num, 2).min(axis=1)
+    cluster_order = optimize_sequence.solve_path(cluster_matrix, cluster_settings)
+
+    rows = [2 * c + k for c in cluster_order for k in (0, 1)] + ([2 * num] if start_ref_job is not None else [])
+    return orient_paths([paths[c] for c in cluster_order], end_dist[np.ix_(rows, rows)],
+                        has_ref=start_ref_job is not None)
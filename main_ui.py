@@ -8,8 +8,8 @@ from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QH
                              QLineEdit, QMessageBox, QHeaderView, QAbstractItemView,
                              QInputDialog, QDialog, QTextEdit, QTableWidget, QTableWidgetItem,
                              QDateEdit, QSplitter, QTreeWidget, QTreeWidgetItem, QStackedWidget, QMenu, QStackedLayout,
-                             QGraphicsView, QGraphicsScene)
-from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QDate, QUrl, QEvent, QPoint, QPointF, QRectF
+                             QGraphicsView, QGraphicsScene, QSpinBox, QCheckBox, QComboBox)
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QDate, QUrl, QEvent, QPoint, QPointF, QRectF, QThread, pyqtSignal
 from PyQt6.QtGui import QColor, QFont, QCursor, QKeySequence, QWheelEvent, QPen, QBrush, QPainterPath, QPolygonF, QTransform
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtWebEngineCore import QWebEngineSettings, QWebEnginePage
@@ -23,6 +23,42 @@ class PandasModel(QAbstractTableModel):
         self._date_columns = []
         self._weekend_columns = []
         self._identify_date_columns()
+        self._reset_parsed_rows()
+
+    def _reset_parsed_rows(self):
+        self._line_col_idx = calculate_schedule.find_line_column(self._data.columns)
+        self._parsed_rows = None
+
+    def line_column(self):
+        return self._line_col_idx
+
+    def update_cells(self, cells):
+        """
+        Sets {(row, col): value} in place and emits one dataChanged over the bounding
+        range of the cells that actually changed (no model reset).
+        """
+        changed = []
+        for (row, col), value in cells.items():
+            old = self._data.iat[row, col]
+            if old is value or (not pd.isna(old) and old == value):
+                continue
+            self._data.iat[row, col] = value
+            changed.append((row, col))
+        if changed:
+            rows = [r for r, _ in changed]
+            cols = [c for _, c in changed]
+            self.dataChanged.emit(self.index(min(rows), min(cols)), self.index(max(rows), max(cols)),
+                                  [Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole])
+
+    def parsed_rows(self):
+        """
+        Static parse of every row (calculate_schedule.parse_row), built on first use and
+        kept up to date by setData (only edits of the parsed columns re-parse a row).
+        """
+        if self._parsed_rows is None:
+            self._parsed_rows = [calculate_schedule.parse_row(values, self._line_col_idx)
+                                 for values in self._data.itertuples(index=False, name=None)]
+        return self._parsed_rows
 
     def _identify_date_columns(self):
         self._date_columns = []
@@ -87,6 +123,8 @@ class PandasModel(QAbstractTableModel):
                     except ValueError:
                         self._data.iloc[row, col] = value
                 
+                if self._parsed_rows is not None and col in calculate_schedule.static_columns(self._line_col_idx):
+                    self._parsed_rows[row] = calculate_schedule.parse_row(self._data.iloc[row].tolist(), self._line_col_idx)
                 self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole])
                 return True
             except Exception as e:
@@ -110,8 +148,10 @@ class PandasModel(QAbstractTableModel):
     def insertRows(self, position, rows, parent=QModelIndex()):
         self.beginInsertRows(parent, position, position + rows - 1)
         empty_row = pd.Series([None]*self.columnCount(), index=self._data.columns)
-        new_df = pd.DataFrame([empty_row])
+        new_df = pd.DataFrame([empty_row] * rows)
         self._data = pd.concat([self._data.iloc[:position], new_df, self._data.iloc[position:]]).reset_index(drop=True)
+        if self._parsed_rows is not None:
+            self._parsed_rows[position:position] = [None] * rows # Empty rows cannot be produced
         self.endInsertRows()
         return True
     
@@ -122,6 +162,7 @@ class PandasModel(QAbstractTableModel):
         self.beginResetModel()
         self._data = df
         self._identify_date_columns()
+        self._reset_parsed_rows()
         self.endResetModel()
 
 
@@ -708,6 +749,12 @@ class CADViewerWidget(QWidget):
 
 # Import logic from existing scripts
 import calculate_schedule
+import optimize_plan
+import optimize_sequence
+import optimize_engine
+import feeder_model
+import solution_cache
+import schedule_reader
 
 
 class HandToolOverlay(QWidget):
@@ -1372,6 +1419,8 @@ class SMDVerificationTab(QWidget):
                 child.setData(0, Qt.ItemDataRole.UserRole, ("PCB", item['pcbCode']))
 
 class ScheduleTab(QWidget):
+    SUMMARY_LINES = ['S01', 'S02', 'S03', 'S04'] # Two summary rows (time, util) per line
+
     def __init__(self):
         super().__init__()
         self.layout = QVBoxLayout()
@@ -1426,6 +1475,9 @@ class ScheduleTab(QWidget):
         
         self.model_summary = PandasModel(pd.DataFrame())
         self.model_main = PandasModel(pd.DataFrame())
+        self.model_main.dataChanged.connect(self.on_main_data_changed)
+        self.summary_date_cols = None
+        self.summary_setup_map = {}
         
         # Grid Layout for 4 tables
         from PyQt6.QtWidgets import QGridLayout
@@ -1521,7 +1573,7 @@ class ScheduleTab(QWidget):
         if not self.current_filepath: return
         
         # Identify Line: Row 0,1 -> S01; 2,3 -> S02...
-        lines = ['S01', 'S02', 'S03', 'S04']
+        lines = self.SUMMARY_LINES
         line_idx = index.row() // 2
         if line_idx >= len(lines): return
         
@@ -1546,14 +1598,8 @@ class ScheduleTab(QWidget):
         self.show_detail_popup(line_name, col_idx, date_str, df)
 
     def show_detail_popup(self, line_name, date_col_idx, date_str, df):
-        # 1. Identify Line Column Index
-        line_col_idx = getattr(self, 'line_col_idx', None)
-        if line_col_idx is None:
-            for i, col in enumerate(df.columns):
-                c_str = str(col).lower()
-                if "line" in c_str or "생산라인" in c_str:
-                    line_col_idx = i
-                    break
+        # 1. Static row data, parsed once per schedule
+        parsed_rows = self.model_main.parsed_rows()
         
         # 2. Setup Map
         setup_map = {}
@@ -1564,20 +1610,14 @@ class ScheduleTab(QWidget):
         details = []
         
         # 3. Iterate and Filter
-        for r_idx, row in df.iterrows():
-            qty_val = row.iloc[date_col_idx]
-            if pd.isna(qty_val) or qty_val <= 0: continue
+        for parsed, qty_val in zip(parsed_rows, df.iloc[:, date_col_idx].tolist()):
+            if parsed is None or pd.isna(qty_val): continue
             
             # Check Line Match
-            row_line = "Unknown"
-            if line_col_idx is not None:
-                val = str(row.iloc[line_col_idx]).strip()
-                if val and val != 'nan': row_line = val
-            
-            if row_line != line_name: continue
+            if parsed['Line'] != line_name: continue
             
             # Calculate
-            res = calculate_schedule.calculate_time_for_row(row, qty_val, setup_map, line_col_idx)
+            res = calculate_schedule.row_production(parsed, qty_val, setup_map)
             details.extend(res)
         
         # Calculate Statistics
@@ -1638,37 +1678,15 @@ class ScheduleTab(QWidget):
         file_path, _ = QFileDialog.getOpenFileName(self, "Open Schedule Excel", "", "Excel Files (*.xlsx);;All Files (*)")
         if file_path:
             try:
-                # 1. Load Main Data
-                df_test = pd.read_excel(file_path, header=None, nrows=40)
-                header_row = 0
-                if df_test.shape[0] > 36:
-                     row_vals = [str(x) for x in df_test.iloc[36].values]
-                     if any("Item" in x for x in row_vals) or any("Code" in x for x in row_vals):
-                         header_row = 36
-                
-                self.df = pd.read_excel(file_path, header=header_row)
-                
-                # Format Date Columns to YYYY-MM-DD
-                new_cols = []
-                for col in self.df.columns:
-                    try:
-                        if isinstance(col, pd.Timestamp):
-                             new_cols.append(col.strftime('%Y-%m-%d'))
-                        else:
-                            # Try parsing string
-                            s_col = str(col)
-                            dt = pd.to_datetime(s_col, errors='coerce')
-                            # Ensure it's a valid recent date to avoid false positives (e.g. pure numbers)
-                            if not pd.isna(dt) and dt.year > 2000:
-                                new_cols.append(dt.strftime('%Y-%m-%d'))
-                            else:
-                                new_cols.append(col)
-                    except:
-                        new_cols.append(col)
-                self.df.columns = new_cols
+                # 1. Load Main Data (one streaming pass or binary snapshot; header row and YYYY-MM-DD date columns detected)
+                self.df, _, snapshot_df = schedule_reader.open_schedule(file_path)
 
                 self.model_main.set_dataframe(self.df)
                 
+                # Without a schedule opened in this session, compare with the last one opened before
+                if getattr(self, 'last_df', None) is None:
+                    self.last_df = snapshot_df
+
                 # Check for existing data comparison
                 if hasattr(self, 'last_df') and self.last_df is not None:
                     # Perform comparison
@@ -1894,21 +1912,11 @@ class ScheduleTab(QWidget):
             try: setup_map[ln] = float(le.text())
             except: setup_map[ln] = 0.0
             
-        # Line Column
-        line_col_idx = getattr(self, 'line_col_idx', None)
-        if line_col_idx is None:
-            for i, col in enumerate(df.columns):
-                c_str = str(col).lower()
-                if "line" in c_str or "생산라인" in c_str:
-                    line_col_idx = i
-                    break
-
         all_items = []
-        for r_idx, row in df.iterrows():
-            qty_val = row.iloc[date_col_idx]
-            if pd.isna(qty_val) or qty_val <= 0: continue
+        for parsed, qty_val in zip(self.model_main.parsed_rows(), df.iloc[:, date_col_idx].tolist()):
+            if parsed is None or pd.isna(qty_val): continue
             
-            res = calculate_schedule.calculate_time_for_row(row, qty_val, setup_map, line_col_idx)
+            res = calculate_schedule.row_production(parsed, qty_val, setup_map)
             all_items.extend(res)
             
         return all_items, None
@@ -1947,15 +1955,8 @@ class ScheduleTab(QWidget):
             except:
                 setup_map[line] = 0.0
 
-        line_col_idx = None
-        for i, col in enumerate(df.columns):
-            c_str = str(col).lower()
-            if "line" in c_str or "생산라인" in c_str:
-                line_col_idx = i
-                break
-        
         # Summary Rows
-        lines = ['S01', 'S02', 'S03', 'S04'] 
+        lines = self.SUMMARY_LINES
         
         # Date Cols
         date_cols = []
@@ -1968,21 +1969,10 @@ class ScheduleTab(QWidget):
             except:
                 pass
         
-        # Cache calculations
-        col_line_totals = {} 
-        
-        for r_idx, row in df.iterrows():
-             for d_col in date_cols:
-                qty_val = row.iloc[d_col]
-                if pd.isna(qty_val) or qty_val == 0:
-                    continue
-                
-                res = calculate_schedule.calculate_time_for_row(row, qty_val, setup_map, line_col_idx)
-                for item in res:
-                    ln = item['Line']
-                    t = item['Prod_Time']
-                    key = (d_col, ln)
-                    col_line_totals[key] = col_line_totals.get(key, 0) + t
+        # Kept for incremental updates on cell edits (update_summary)
+        self.summary_date_cols = date_cols
+        self.summary_setup_map = setup_map
+        col_line_totals = self.line_totals(df, date_cols)
 
         # Build Summary DF
         summ_rows = []
@@ -2001,21 +1991,65 @@ class ScheduleTab(QWidget):
             row_util[target_idx] = f"{line} Util(%)"
             
             for d_col in date_cols:
-                t = col_line_totals.get((d_col, line), 0)
-                row_time[d_col] = round(t, 1) if t > 0 else ""
-                
-                if t > 0:
-                    util = (t / 480.0) * 100
-                    row_util[d_col] = f"{util:.1f}%"
-                else:
-                    row_util[d_col] = "" 
+                row_time[d_col], row_util[d_col] = self.summary_cells(col_line_totals.get((d_col, line), 0))
             
             summ_rows.append(row_time)
             summ_rows.append(row_util)
             
-        df_summ = pd.DataFrame(summ_rows, columns=df.columns)
+        # Object columns so that single cells can be updated with any value type
+        df_summ = pd.DataFrame(summ_rows, columns=df.columns, dtype=object)
         self.model_summary.set_dataframe(df_summ)
 
+    def line_totals(self, df, date_cols):
+        """
+        Total production time per (date column, line) of the given date columns, from the
+        model's static row parse and the quantities (vectorized over rows and dates).
+        """
+        qty = calculate_schedule.schedule_quantities(df, date_cols)
+        totals = calculate_schedule.line_date_totals(self.model_main.parsed_rows(), qty, self.summary_setup_map)
+        col_line_totals = {}
+        for ln, day_totals in totals.iterrows():
+            for pos, t in enumerate(day_totals.to_numpy()):
+                if t:
+                    col_line_totals[(date_cols[pos], ln)] = t
+        return col_line_totals
+
+    @staticmethod
+    def summary_cells(t):
+        """Summary (time, utilization) cell values of a line's total time on a date."""
+        if t > 0:
+            util = (t / 480.0) * 100
+            return round(t, 1), f"{util:.1f}%"
+        return "", ""
+
+    def update_summary(self, date_cols):
+        """
+        Recomputes the summary totals of only the given date columns and updates the
+        changed summary cells in place (targeted dataChanged, no model reset).
+        """
+        col_line_totals = self.line_totals(self.model_main.get_dataframe(), date_cols)
+        cells = {}
+        for i, line in enumerate(self.SUMMARY_LINES):
+            for d_col in date_cols:
+                t_cell, u_cell = self.summary_cells(col_line_totals.get((d_col, line), 0))
+                cells[(2 * i, d_col)] = t_cell
+                cells[(2 * i + 1, d_col)] = u_cell
+        self.model_summary.update_cells(cells)
+
+    def on_main_data_changed(self, top_left, bottom_right, roles=None):
+        """Keeps the summary in sync with cell edits of the schedule."""
+        if self.summary_date_cols is None or self.model_summary.rowCount() == 0:
+            return
+        cols = range(top_left.column(), bottom_right.column() + 1)
+        static_cols = calculate_schedule.static_columns(self.model_main.line_column())
+        if any(c in static_cols for c in cols):
+            # Item, layer, T/T, array or line edits change the row's time on every date
+            date_cols = self.summary_date_cols
+        else:
+            date_cols = [c for c in cols if c in self.summary_date_cols]
+        if date_cols:
+            self.update_summary(date_cols)
+
     def save_excel(self):
         file_path, _ = QFileDialog.getSaveFileName(self, "Save Excel", "", "Excel Files (*.xlsx)")
         if file_path:
@@ -2099,6 +2133,28 @@ class DateRangeDialog(QDialog):
         e = self.end_date.date().toString("yyyy-MM-dd")
         return s, e
 
+class OptimizationWorker(QThread):
+    """Runs optimize_engine.iter_optimize_days off the GUI thread, one signal per finished day."""
+    day_finished = pyqtSignal(str, object) # date_str, result DataFrame
+
+    def __init__(self, day_items, bom_folder, common_materials, options, parent=None):
+        super().__init__(parent)
+        self.day_items = day_items
+        self.bom_folder = bom_folder
+        self.common_materials = common_materials
+        self.options = options
+        self.error = None # Message of the exception that stopped the run
+
+    def run(self):
+        try:
+            for date_str, df_res in optimize_engine.iter_optimize_days(
+                    self.day_items, self.bom_folder, self.common_materials, **self.options):
+                self.day_finished.emit(date_str, df_res)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            self.error = str(e)
+
 class OptimizationTab(QWidget):
     def __init__(self):
         super().__init__()
@@ -2129,6 +2185,52 @@ class OptimizationTab(QWidget):
         self.layer_edit.setPlaceholderText("TB or BT")
         self.layer_edit.setFixedWidth(60)
         row1_layout.addWidget(self.layer_edit)
+        
+        row1_layout.addWidget(QLabel("Workers:"))
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, 64)
+        self.workers_spin.setValue(1)
+        self.workers_spin.setToolTip("Number of days optimized in parallel (1 = serial)")
+        row1_layout.addWidget(self.workers_spin)
+        
+        self.joint_check = QCheckBox("Joint Optimization")
+        self.joint_check.setToolTip("Optimize priority and layer stages in one model instead of stage by stage")
+        row1_layout.addWidget(self.joint_check)
+        
+        row1_layout.addWidget(QLabel("Feeder Slots:"))
+        self.feeder_edit = QLineEdit()
+        self.feeder_edit.setPlaceholderText("e.g. 120 or S01:120,S02:100,*:120 (empty = off)")
+        self.feeder_edit.setFixedWidth(220)
+        row1_layout.addWidget(self.feeder_edit)
+        
+        row1_layout.addWidget(QLabel("Lines:"))
+        self.lines_edit = QLineEdit()
+        self.lines_edit.setPlaceholderText("e.g. S01,S02,S03,S04 (empty = keep)")
+        self.lines_edit.setToolTip("Assign each day's jobs to these lines, balancing utilization")
+        self.lines_edit.setFixedWidth(200)
+        row1_layout.addWidget(self.lines_edit)
+        
+        row1_layout.addWidget(QLabel("Shift Cut-off:"))
+        self.cutoff_combo = QComboBox()
+        self.cutoff_combo.addItems(["Off", "Soft", "Hard"])
+        self.cutoff_combo.setToolTip("Sequence on the shift clock (Prod_Time + changeover minutes).\n"
+                                     "Soft: penalize overtime, Hard: defer jobs that do not fit")
+        row1_layout.addWidget(self.cutoff_combo)
+        
+        self.incremental_check = QCheckBox("Incremental")
+        self.incremental_check.setToolTip("Repair each day's previous result (schedule changes only) instead of solving from scratch")
+        row1_layout.addWidget(self.incremental_check)
+        
+        row1_layout.addWidget(QLabel("Started Jobs:"))
+        self.frozen_spin = QSpinBox()
+        self.frozen_spin.setRange(0, 999)
+        self.frozen_spin.setToolTip("Jobs at the start of the first date's previous result that have already started (kept in place)")
+        row1_layout.addWidget(self.frozen_spin)
+        
+        self.cache_check = QCheckBox("Solution Cache")
+        self.cache_check.setChecked(True)
+        self.cache_check.setToolTip("Reuse (and keep improving) the best routes found for identical job sets")
+        row1_layout.addWidget(self.cache_check)
         self.layout.addLayout(row1_layout)
         
         # Manual Sequence (Row 2)
@@ -2155,6 +2257,9 @@ class OptimizationTab(QWidget):
         
         self.setLayout(self.layout)
         self.schedule_tab_ref = None
+        self.last_sequences = {} # date_str -> [(Item_Code, Layer)] of the last result (incremental mode)
+        self.worker = None # OptimizationWorker of the running optimization
+        self.processed_count = 0
 
     def set_schedule_tab(self, tab):
         self.schedule_tab_ref = tab
@@ -2187,6 +2292,8 @@ class OptimizationTab(QWidget):
             line_edit.setText(path)
 
     def run_optimization(self):
+        if self.worker is not None:
+            return # Still running
         bom_folder = self.bom_edit.text()
         common_path = self.common_edit.text()
         
@@ -2216,113 +2323,93 @@ class OptimizationTab(QWidget):
                 
             date_list = pd.date_range(start=start_date, end=end_date).strftime('%Y-%m-%d').tolist()
             
+            common_materials = optimize_plan.load_common_materials(common_path)
+            priority_text = self.priority_edit.text()
+            layer_text = self.layer_edit.text().strip().upper()
+            manual_text = self.manual_edit.toPlainText().replace('\n', ' ').strip()
+            cutoff_text = self.cutoff_combo.currentText()
+            settings = optimize_sequence.SolverSettings(
+                feeder_slots=feeder_model.parse_feeder_slots(self.feeder_edit.text()),
+                shift_cutoff=None if cutoff_text == "Off" else cutoff_text.lower())
+            if self.cache_check.isChecked():
+                settings.cache = solution_cache.SolutionCache(os.path.join("Output", solution_cache.CACHE_DIR_NAME))
+                settings.cache_improve = True
+            lines = [x.strip() for x in self.lines_edit.text().split(',') if x.strip()] or None
+            if self.incremental_check.isChecked():
+                conflict = optimize_sequence.incremental_conflict(lines, settings.shift_cutoff)
+                if conflict:
+                    QMessageBox.warning(self, "Error", conflict)
+                    return
+            
             # Clear previous results
             self.result_tabs.clear()
-            base_input_dir = "Input"
-            
-            processed_count = 0
             
+            # Step 2: Get Data from Schedule Tab
+            day_items = []
             for date_str in date_list:
-                print(f"Processing Date: {date_str}")
-                
-                # Step 2: Get Data from Schedule Tab
                 items, error_msg = self.schedule_tab_ref.get_production_data(date_str)
                 if error_msg or not items:
                     print(f"Skipping {date_str}: {error_msg or 'No items'}")
                     continue
-                
-                # Save item_list.txt
-                item_list_dst = os.path.join(base_input_dir, "item_list.txt")
-                with open(item_list_dst, 'w', encoding='utf-8-sig') as f:
-                    f.write("Item_Code,T_B,Qty,Prod_Time\n")
-                    for item in items:
-                         tb_char = 'T' if item['Layer'] == 'Top' else 'B'
-                         f.write(f"{item['Item_Code']},{tb_char},{item['Qty']},{item['Prod_Time']}\n")
-
-                # Step 3: Build Dynamic BOM
-                required_items = set()
-                with open(item_list_dst, 'r', encoding='utf-8-sig') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        if 'Item_Code' in row:
-                            required_items.add(row['Item_Code'].strip())
-                
-                merged_bom_path = os.path.join(base_input_dir, "BOM.txt")
-                with open(merged_bom_path, 'w', encoding='utf-8-sig', newline='') as f_out:
-                    writer = None
-                    for item_code in required_items:
-                        bom_file = os.path.join(bom_folder, f"{item_code}.txt")
-                        if os.path.exists(bom_file):
-                            with open(bom_file, 'r', encoding='utf-8-sig') as f_in:
-                                lines = f_in.readlines()
-                                if lines:
-                                    if writer is None:
-                                        f_out.write(lines[0]) 
-                                        writer = True
-                                    for line in lines[1:]:
-                                        if line.strip():
-                                            f_out.write(line)
-
-                # Step 4 & 5: Run Optimization Scripts
-                
-                # CLEANUP: Remove stale output from previous iteration to avoid Duplicate/Wrong data
-                result_path = "Output/optimization_sequence.csv"
-                if os.path.exists(result_path):
-                    os.remove(result_path)
-
-                cmd_plan = [sys.executable, "optimize_plan.py"]
-                subprocess.run(cmd_plan, check=True)
-                
-                cmd_seq = [sys.executable, "optimize_sequence.py"]
-                if self.priority_edit.text():
-                    cmd_seq.extend(["--priority", self.priority_edit.text()])
-                if self.layer_edit.text():
-                    cmd_seq.extend(["--layer", self.layer_edit.text()])
-                manual_text = self.manual_edit.toPlainText().replace('\n', ' ').strip()
-                if manual_text:
-                    cmd_seq.extend(["--manual", manual_text])
-                    
-                subprocess.run(cmd_seq, check=True)
-                
-                # Load Result
-                df_res = pd.DataFrame()
-                if os.path.exists(result_path):
-                    df_res = pd.read_csv(result_path)
-                else:
-                    # If no result generated (e.g. 0 items), create empty DF with standard columns
-                    cols = ['Index', 'Item_Code', 'Layer', 'Qty', 'Prod_Time', 'Total_Count', 
-                            'Common_Count', 'Individual_Count', 'Transition_Shared_Count', 'Selection_Reason']
-                    df_res = pd.DataFrame(columns=cols)
-                    
-                # Create Tab
-                tab = QWidget()
-                tab_layout = QVBoxLayout()
-                table = QTableView()
-                model = PandasModel(df_res)
-                table.setModel(model)
-                tab_layout.addWidget(table)
-                tab.setLayout(tab_layout)
-                
-                # Store model in tab for export
-                table.setProperty("model_ref", model) 
-                
-                self.result_tabs.addTab(tab, date_str)
-                processed_count += 1
+                day_items.append((date_str, items))
+            
+            # Step 3-5: Load BOMs and Run Optimization (in-process or across worker processes)
+            # on a worker thread; finished days are shown as soon as they complete, kept in date order.
+            options = dict(workers=self.workers_spin.value(), priority=priority_text,
+                           layer=layer_text, manual=manual_text, joint=self.joint_check.isChecked(),
+                           lines=lines, settings=settings, frozen_counts={date_list[0]: self.frozen_spin.value()},
+                           previous_sequences=dict(self.last_sequences) if self.incremental_check.isChecked() else None)
+            self.processed_count = 0
+            self.worker = OptimizationWorker(day_items, bom_folder, common_materials, options, self)
+            self.worker.day_finished.connect(self.on_day_finished)
+            self.worker.finished.connect(self.on_optimization_finished)
+            self.btn_run.setEnabled(False)
+            self.btn_run.setText("Optimizing...")
+            self.worker.start()
             
-            if processed_count == 0:
-                QMessageBox.warning(self, "Info", "No data processed for the selected range.")
-            else:
-                QMessageBox.information(self, "Done", f"Optimization Complete! Processed {processed_count} days.")
-            
-        except subprocess.CalledProcessError as e:
-            QMessageBox.critical(self, "Error", f"Script failed: {e}")
         except Exception as e:
             import traceback
             traceback.print_exc()
             QMessageBox.critical(self, "Error", str(e))
+
+    def on_day_finished(self, date_str, df_res):
+        print(f"Processed Date: {date_str}")
+        self.last_sequences[date_str] = optimize_engine.sequence_keys(df_res)
+        self.add_result_tab(date_str, df_res)
+        self.processed_count += 1
+
+    def on_optimization_finished(self):
+        error = self.worker.error
+        self.worker = None
+        self.btn_run.setEnabled(True)
+        self.btn_run.setText("Run Optimization")
+        if error:
+            QMessageBox.critical(self, "Error", error)
+        elif self.processed_count == 0:
+            QMessageBox.warning(self, "Info", "No data processed for the selected range.")
+        else:
+            QMessageBox.information(self, "Done", f"Optimization Complete! Processed {self.processed_count} days.")
             
 
 
+    def add_result_tab(self, date_str, df_res):
+        tab = QWidget()
+        tab_layout = QVBoxLayout()
+        table = QTableView()
+        model = PandasModel(df_res)
+        table.setModel(model)
+        tab_layout.addWidget(table)
+        tab.setLayout(tab_layout)
+        
+        # Store model in tab for export
+        table.setProperty("model_ref", model) 
+        
+        # Insert in date order (days may finish out of order)
+        pos = 0
+        while pos < self.result_tabs.count() and self.result_tabs.tabText(pos) < date_str:
+            pos += 1
+        self.result_tabs.insertTab(pos, tab, date_str)
+
     def export_result(self):
         curr_idx = self.result_tabs.currentIndex()
         if curr_idx == -1: return
@@ -2366,6 +2453,12 @@ class MainWindow(QMainWindow):
         
         # Link Tabs
         self.tab_optimize.set_schedule_tab(self.tab_schedule)
+
+    def closeEvent(self, event):
+        # A running optimization cannot be interrupted: let it finish before closing
+        if self.tab_optimize.worker is not None:
+            self.tab_optimize.worker.wait()
+        super().closeEvent(event)
         
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,116 @@
+import numpy as np
+
+# Popcount of every byte value (fallback for NumPy < 2.0 without np.bitwise_count)
+_POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+# Rows of the pairwise XOR processed at once (bounds the (block, n, words) temporary)
+BLOCK_ROWS = 64
+
+class MaterialIndex:
+    """Interns Material_Codes to consecutive integer ids."""
+    def __init__(self, codes=()):
+        self.codes = []
+        self.ids = {}
+        for code in codes:
+            self.intern(code)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def intern(self, code):
+        idx = self.ids.get(code)
+        if idx is None:
+            idx = len(self.codes)
+            self.ids[code] = idx
+            self.codes.append(code)
+        return idx
+
+    def encode(self, materials):
+        """Returns the sorted integer ids of a set of Material_Codes."""
+        return np.array(sorted(self.intern(m) for m in materials), dtype=np.int64)
+
+def pack_sets(material_sets, index=None):
+    """
+    Packs material sets into a bit matrix, one row per set.
+    Returns (packed uint8 array of shape (n, ceil(m / 8)), MaterialIndex).
+    """
+    if index is None:
+        index = MaterialIndex()
+    encoded = [index.encode(s) for s in material_sets]
+    num_bits = max(len(index), 1)
+    bits = np.zeros((len(encoded), num_bits), dtype=bool)
+    for row, ids in enumerate(encoded):
+        bits[row, ids] = True
+    return np.packbits(bits, axis=1), index
+
+def popcount(packed):
+    """Number of set bits per row of a packed uint8 array (summed over the last axis)."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(packed).sum(axis=-1, dtype=np.int64)
+    return _POPCOUNT8[packed].sum(axis=-1, dtype=np.int64)
+
+def pairwise_xor_counts(packed_a, packed_b):
+    """|A_i Δ B_j| for every row pair of two packed bit matrices with the same width."""
+    result = np.empty((packed_a.shape[0], packed_b.shape[0]), dtype=np.int64)
+    for start in range(0, packed_a.shape[0], BLOCK_ROWS):
+        block = packed_a[start:start + BLOCK_ROWS]
+        result[start:start + len(block)] = popcount(block[:, None, :] ^ packed_b[None, :, :])
+    return result
+
+def changeover_matrix(material_sets, start_ref_set=None):
+    """
+    Builds the (n+1) x (n+1) changeover (symmetric difference) matrix of a job list.
+
+    Node 0 is the depot: the cost from the depot to job i is |start_ref_set Δ set_i|
+    (0 without a reference job), and every job returns to the depot for free.
+    Nodes 1..n are the jobs in the given order.
+    """
+    sets = list(material_sets)
+    if start_ref_set is not None:
+        sets.append(start_ref_set)
+    packed, _ = pack_sets(sets)
+
+    num_jobs = len(material_sets)
+    jobs_packed = packed[:num_jobs]
+    matrix = np.zeros((num_jobs + 1, num_jobs + 1), dtype=np.int64)
+    matrix[1:, 1:] = pairwise_xor_counts(jobs_packed, jobs_packed)
+    if start_ref_set is not None:
+        matrix[0, 1:] = pairwise_xor_counts(packed[num_jobs:], jobs_packed)[0]
+    return matrix
+
+class UsageMatrix:
+    """
+    Sparse (CSR) row x material usage matrix of a list of material sets: row r uses the
+    material ids indices[indptr[r]:indptr[r + 1]] (ids of a MaterialIndex).
+    """
+    def __init__(self, material_sets, index=None):
+        if index is None:
+            index = MaterialIndex()
+        self.index = index
+        encoded = [index.encode(s) for s in material_sets]
+        self.indptr = np.zeros(len(encoded) + 1, dtype=np.int64)
+        self.indptr[1:] = np.cumsum([len(ids) for ids in encoded])
+        self.indices = np.concatenate(encoded) if encoded else np.zeros(0, dtype=np.int64)
+
+    @property
+    def num_rows(self):
+        return len(self.indptr) - 1
+
+    @property
+    def num_materials(self):
+        return len(self.index)
+
+    def entry_rows(self):
+        """Row of every stored entry (parallel to indices)."""
+        return np.repeat(np.arange(self.num_rows), np.diff(self.indptr))
+
+    def material_counts(self, row_groups=None):
+        """
+        Number of rows using each material. With row_groups (a group id per row), the
+        number of distinct groups using it instead (e.g. items over item-layer rows).
+        """
+        if row_groups is None:
+            return np.bincount(self.indices, minlength=self.num_materials)
+        groups = np.asarray(row_groups, dtype=np.int64)[self.entry_rows()]
+        pairs = np.unique(groups * self.num_materials + self.indices)
+        return np.bincount(pairs % self.num_materials, minlength=self.num_materials)
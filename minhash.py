@@ -0,0 +1,66 @@
+import numpy as np
+
+import material_matrix
+
+PRIME = (1 << 31) - 1 # Hash modulus; a * id + b stays below 2^63
+NUM_PERM = 64
+
+def signatures(material_sets, num_perm=NUM_PERM, seed=1, index=None):
+    """
+    MinHash signatures of material sets: an (n, num_perm) int64 array whose column k is
+    the minimum of the k-th random hash (a * id + b) mod PRIME over a set's material ids.
+    The share of equal columns of two rows estimates the Jaccard similarity of the sets.
+    """
+    if index is None:
+        index = material_matrix.MaterialIndex()
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, PRIME, num_perm, dtype=np.int64)
+    b = rng.integers(0, PRIME, num_perm, dtype=np.int64)
+
+    sigs = np.full((len(material_sets), num_perm), PRIME, dtype=np.int64)
+    for row, materials in enumerate(material_sets):
+        ids = index.encode(materials)
+        if len(ids):
+            sigs[row] = ((a[:, None] * ids[None, :] + b[:, None]) % PRIME).min(axis=1)
+    return sigs
+
+def similarity(sigs, row, others):
+    """Estimated Jaccard similarity of signature row `row` to each row in `others`."""
+    return (sigs[others] == sigs[row]).mean(axis=1)
+
+class LSHIndex:
+    """
+    Locality-sensitive hashing index over MinHash signatures: the signature is split
+    into `bands` bands, and rows sharing any band (same bucket) are candidate neighbours.
+    With 64 hashes in 32 bands of 2, sets with a Jaccard similarity above ~0.2 are likely
+    to share a bucket, so a query only looks at a few rows instead of all of them.
+    """
+    def __init__(self, sigs, bands=32):
+        self.sigs = sigs
+        self.bands = bands
+        self.rows = sigs.shape[1] // bands
+        self.tables = [{} for _ in range(bands)]
+        for b, table in enumerate(self.tables):
+            block = np.ascontiguousarray(sigs[:, b * self.rows:(b + 1) * self.rows])
+            for row, key in enumerate(block):
+                table.setdefault(key.tobytes(), []).append(row)
+
+    def candidates(self, sig):
+        """Rows sharing at least one bucket with a signature."""
+        found = set()
+        for b, table in enumerate(self.tables):
+            found.update(table.get(np.ascontiguousarray(sig[b * self.rows:(b + 1) * self.rows]).tobytes(), ()))
+        return found
+
+    def query(self, sig, k, exclude=None):
+        """
+        Up to k approximate nearest rows of a signature (most similar first).
+        exclude: optional boolean mask of rows to skip.
+        """
+        found = np.array(sorted(self.candidates(sig)), dtype=np.int64)
+        if exclude is not None and len(found):
+            found = found[~exclude[found]]
+        if not len(found):
+            return found
+        sims = (self.sigs[found] == sig).mean(axis=1)
+        return found[np.argsort(-sims, kind='stable')[:k]]
@@ -0,0 +1,136 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import bom_store
+import optimize_plan
+import optimize_sequence
+
+# Columns of an empty sequence result (same as the CSV written by optimize_sequence.py)
+RESULT_COLUMNS = ['Index', 'Item_Code', 'Layer', 'Qty', 'Prod_Time', 'Total_Count',
+                  'Common_Count', 'Individual_Count', 'Transition_Shared_Count', 'Selection_Reason']
+
+def load_item_boms(bom_folder, item_codes):
+    """
+    Loads the per-item BOM files (<bom_folder>/<Item_Code>.txt) of the given items
+    through the folder's BomStore (parsed once, cached by file mtime/size).
+    Returns (Item_Code, Layer) -> Set of Material_Code.
+    """
+    store = bom_store.get_bom_store(bom_folder)
+    item_layer_materials = store.load_items(item_codes)
+    store.save()
+    return item_layer_materials
+
+def items_to_prod_data(items):
+    """
+    Converts production items (as returned by calculate_time_for_row) into
+    the (Item_Code, Layer) -> {'Qty', 'Prod_Time'[, 'Line']} map of load_production_data.
+    """
+    prod_data = {}
+    for item in items:
+        layer = 'Top' if item['Layer'] == 'Top' else 'Bottom'
+        prod_data[(item['Item_Code'], layer)] = {
+            'Qty': item['Qty'],
+            'Prod_Time': item['Prod_Time']
+        }
+        if item.get('Line'):
+            prod_data[(item['Item_Code'], layer)]['Line'] = item['Line']
+    return prod_data
+
+def optimize_day(items, item_layer_materials, common_materials, priority=None, layer=None, manual=None,
+                 settings=None, joint=False, lines=None, previous=None, frozen=0):
+    """
+    Runs the plan analysis and sequence optimization in-process for one day.
+
+    items: production items of the day (Item_Code, Layer, Qty, Prod_Time).
+    item_layer_materials: (Item_Code, Layer) -> Set of Material_Code for the day's BOMs.
+    common_materials: set of fixed common Material_Codes.
+    priority / layer / manual: same meaning as the optimize_sequence.py options.
+    settings: optimize_sequence.SolverSettings (time policy); defaults when None.
+    joint: optimize priority and layer stages in one model (optimize_sequence --joint).
+    lines: production lines to assign and balance the jobs across (optimize_sequence --lines).
+    previous / frozen: previous sequence of the day as (Item_Code, Layer) keys to repair
+                       incrementally, and how many of its jobs have already started
+                       (optimize_sequence --previous / --frozen).
+
+    Returns the sequence result as a DataFrame (columns of optimization_sequence.csv).
+    """
+    if layer and layer not in ('TB', 'BT'):
+        raise ValueError(f"Invalid layer order '{layer}' (expected TB or BT).")
+    if previous:
+        conflict = optimize_sequence.incremental_conflict(lines, settings.shift_cutoff if settings else None)
+        if conflict:
+            raise ValueError(conflict)
+
+    results = optimize_plan.analyze_materials(item_layer_materials, common_materials, joined=False)
+    jobs = optimize_sequence.build_jobs(results, common_materials)
+    if not jobs:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    optimize_sequence.merge_production_data(jobs, items_to_prod_data(items))
+
+    manual_keys = None
+    priority_codes = []
+    if manual:
+        manual_keys = optimize_sequence.parse_manual_sequence(manual)
+    elif priority:
+        priority_codes = [x.strip() for x in priority.split(',') if x.strip()]
+
+    final_sequence = optimize_sequence.sequence_jobs(jobs, priority_codes, layer or None, manual_keys, settings,
+                                                    joint=joint, lines=lines, previous_keys=previous,
+                                                    frozen_count=frozen)
+    if not final_sequence:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    fieldnames, rows = optimize_sequence.build_result_rows(jobs, final_sequence)
+    return pd.DataFrame(rows, columns=fieldnames)
+
+def sequence_keys(df_res):
+    """(Item_Code, Layer) order of a sequence result DataFrame (for incremental re-runs)."""
+    if df_res is None or df_res.empty:
+        return []
+    return list(zip(df_res['Item_Code'].astype(str), df_res['Layer'].astype(str)))
+
+def optimize_day_task(date_str, items, bom_folder, common_materials, previous_sequences=None,
+                      frozen_counts=None, **options):
+    """
+    Loads the day's BOMs and optimizes it (options as in optimize_day).
+    previous_sequences: date_str -> previous sequence keys; the day's entry (if any) is
+                        repaired incrementally instead of solved from scratch.
+    frozen_counts: date_str -> number of jobs of that day's previous sequence that have
+                   already started (other days have none).
+    Top-level so it can run in a worker process.
+    """
+    if previous_sequences and date_str in previous_sequences:
+        options['previous'] = previous_sequences[date_str]
+    if frozen_counts and date_str in frozen_counts:
+        options['frozen'] = frozen_counts[date_str]
+    item_layer_materials = load_item_boms(bom_folder, {item['Item_Code'] for item in items})
+    df_res = optimize_day(items, item_layer_materials, common_materials, **options)
+    return date_str, df_res
+
+def iter_optimize_days(day_items, bom_folder, common_materials, workers=1, **options):
+    """
+    Optimizes several independent days and yields (date_str, DataFrame) as each one finishes.
+
+    day_items: list of (date_str, items).
+    workers: number of worker processes. 1 runs the days serially in this process
+             (results in date order); more spreads them across a process pool
+             (results in completion order).
+    options: keyword options of optimize_day (priority, layer, manual, settings, joint, lines)
+             and previous_sequences / frozen_counts (see optimize_day_task).
+    """
+    if workers <= 1 or len(day_items) <= 1:
+        for date_str, items in day_items:
+            yield optimize_day_task(date_str, items, bom_folder, common_materials, **options)
+        return
+
+    # Parse any new/changed BOMs once here so the workers only read the cache
+    load_item_boms(bom_folder, {item['Item_Code'] for _, items in day_items for item in items})
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(day_items))) as pool:
+        futures = [pool.submit(optimize_day_task, date_str, items, bom_folder, common_materials, **options)
+                   for date_str, items in day_items]
+        for future in as_completed(futures):
+            yield future.result()
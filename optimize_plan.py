@@ -11,38 +11,135 @@ import csv
 import os
 import argparse
 
+import common_selection
+import material_matrix
+import result_store
+
+RESULT_FIELDS = ['Item_Code', 'Layer', 'Common_Count', 'Individual_Count', 'Common_Materials', 'Individual_Materials']
+COMMON_PART_FIELDS = ['Common_Material_Code', 'Item_Count', 'Job_Count', 'Coverage']
+
+def tb_to_layer(t_b_code):
+    """Maps a BOM T_B code (SB/ST) to a layer name."""
+    t_b_code = t_b_code.strip().upper()
+    if t_b_code == "SB":
+        return "Bottom"
+    elif t_b_code == "ST":
+        return "Top"
+    return "Unknown"
+
+def load_common_materials(file_path):
+    """Loads common_material_list.csv (Material_Code column) into a set."""
+    common_materials = set()
+    if os.path.exists(file_path):
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                if 'Material_Code' in row and row['Material_Code']:
+                    common_materials.add(row['Material_Code'].strip())
+        print(f"Loaded {len(common_materials)} common materials from {file_path}.")
+    else:
+        print(f"Warning: Common material file not found: {file_path}. Treating all materials as individual.")
+    return common_materials
+
+def load_bom_rows(reader, item_layer_materials=None):
+    """
+    Collects BOM rows (dicts with Item_Code, Material_Code, T_B) into
+    (Item_Code, Layer) -> Set of Material_Code.
+    """
+    if item_layer_materials is None:
+        item_layer_materials = {}
+    for row in reader:
+        item_code = row.get('Item_Code', '').strip()
+        material_code = row.get('Material_Code', '').strip()
+        layer = tb_to_layer(row.get('T_B', ''))
+
+        if item_code and material_code:
+            key = (item_code, layer)
+            if key not in item_layer_materials:
+                item_layer_materials[key] = set()
+            item_layer_materials[key].add(material_code)
+    return item_layer_materials
+
+def load_bom(bom_path, item_layer_materials=None):
+    """Loads a BOM file into (Item_Code, Layer) -> Set of Material_Code."""
+    with open(bom_path, 'r', encoding='utf-8-sig') as f:
+        return load_bom_rows(csv.DictReader(f), item_layer_materials)
+
+def analyze_materials(item_layer_materials, common_materials, joined=True):
+    """
+    Splits each item-layer material set into common and individual parts.
+    Returns a list of result rows (see RESULT_FIELDS), sorted by (Item_Code, Layer).
+    joined: material fields as comma-joined strings (CSV); False keeps sorted lists.
+    """
+    join = ','.join if joined else list
+    results = []
+    for item, layer in sorted(item_layer_materials.keys()):
+        materials = item_layer_materials[(item, layer)]
+        common_in_item = {m for m in materials if m in common_materials}
+        individual_in_item = materials - common_in_item
+
+        results.append({
+            'Item_Code': item,
+            'Layer': layer,
+            'Common_Count': len(common_in_item),
+            'Individual_Count': len(individual_in_item),
+            'Common_Materials': join(sorted(common_in_item)),
+            'Individual_Materials': join(sorted(individual_in_item))
+        })
+    return results
+
+def extract_common_materials(item_layer_materials, coverage=1.0):
+    """
+    Finds the materials used by at least `coverage` (0-1) of the items, in one pass over
+    a sparse item-layer x material usage matrix. Item_Count counts items (layers merged),
+    Job_Count item-layer jobs. Returns (rows of COMMON_PART_FIELDS sorted by Item_Count
+    descending then code, number of items).
+    """
+    keys = sorted(item_layer_materials)
+    usage = material_matrix.UsageMatrix([item_layer_materials[key] for key in keys])
+    item_ids = {}
+    row_items = [item_ids.setdefault(item, len(item_ids)) for item, _ in keys]
+
+    item_counts = usage.material_counts(row_items)
+    job_counts = usage.material_counts()
+    num_items = len(item_ids)
+    selected = [m for m in range(usage.num_materials) if item_counts[m] >= coverage * num_items - 1e-9]
+    selected.sort(key=lambda m: (-item_counts[m], usage.index.codes[m]))
+
+    rows = [{
+        'Common_Material_Code': usage.index.codes[m],
+        'Item_Count': int(item_counts[m]),
+        'Job_Count': int(job_counts[m]),
+        'Coverage': round(item_counts[m] / num_items, 4)
+    } for m in selected]
+    return rows, num_items
+
 def main():
     parser = argparse.ArgumentParser(description='Analyze BOM data.')
-    parser.add_argument('--extract-common', action='store_true', help='Extract common parts used by ALL items.')
+    parser.add_argument('--extract-common', action='store_true', help='Extract common parts used by all items (or by --coverage of them).')
+    parser.add_argument('--coverage', type=float, default=1.0, help='With --extract-common, minimum share of items (0-1) using a material, e.g. 0.8.')
     parser.add_argument('--items', type=str, help='Comma-separated list of specific Item_Codes to analyze for common parts.')
+    parser.add_argument('--select-common', type=int, metavar='K', help='Propose K more permanently loaded (common) materials for the spare feeder slots, minimizing the changeovers of the BOM jobs.')
+    parser.add_argument('--format', type=str, choices=['csv', 'npz'], default='csv', help='Result format read by optimize_sequence.py: csv (comma-joined material codes) or npz (columnar, material ids; faster to read for large BOMs).')
     args = parser.parse_args()
 
     # File Paths
     base_dir = "."
     bom_path = os.path.join(base_dir, "Input", "BOM.txt")
     common_list_path = os.path.join(base_dir, "Input", "common_material_list.csv")
-    output_path = os.path.join(base_dir, "Output", "optimization_result.csv")
+    output_path = os.path.join(base_dir, "Output", f"optimization_result.{args.format}")
     common_extract_path = os.path.join(base_dir, "Output", "common_part.csv")
+    proposal_path = os.path.join(base_dir, "Output", "proposed_common_material_list.csv")
 
-    # --- Mode 1: Extract Common Parts (Dynamic Intersection) ---
+    # --- Mode 1: Extract Common Parts (Usage Coverage) ---
     if args.extract_common:
-        print("Extracting common parts (Dynamic Intersection)...")
+        print(f"Extracting common parts (used by >= {args.coverage:.0%} of items)...")
         print("Loading BOM data...")
-        item_materials = {} # Item_Code -> Set of Material_Code
         
         try:
-            with open(bom_path, 'r', encoding='utf-8-sig') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    item_code = row.get('Item_Code', '').strip()
-                    material_code = row.get('Material_Code', '').strip()
-                    
-                    if item_code and material_code:
-                        if item_code not in item_materials:
-                            item_materials[item_code] = set()
-                        item_materials[item_code].add(material_code)
+            item_layer_materials = load_bom(bom_path)
             
-            if not item_materials:
+            if not item_layer_materials:
                 print("No data found in BOM.")
                 return
 
@@ -51,36 +148,30 @@ def main():
                 target_items = [x.strip() for x in args.items.split(',') if x.strip()]
                 print(f"Filtering for items: {target_items}")
                 
-                filtered_materials = {k: v for k, v in item_materials.items() if k in target_items}
+                filtered_materials = {k: v for k, v in item_layer_materials.items() if k[0] in target_items}
                 
                 if not filtered_materials:
                     print(f"Error: None of the requested items {target_items} were found in the BOM.")
                     return
                 
                 # Check if all requested items were found
-                found_keys = list(filtered_materials.keys())
+                found_keys = {k[0] for k in filtered_materials}
                 if len(found_keys) < len(target_items):
-                    missing = set(target_items) - set(found_keys)
+                    missing = set(target_items) - found_keys
                     print(f"Warning: The following items were not found in BOM: {missing}")
                 
-                item_materials = filtered_materials
+                item_layer_materials = filtered_materials
 
-            # Calculate Intersection across selected items
-            first_item = next(iter(item_materials))
-            common_set = item_materials[first_item].copy()
-            
-            for item, mats in item_materials.items():
-                common_set.intersection_update(mats)
+            common_rows, num_items = extract_common_materials(item_layer_materials, args.coverage)
             
-            print(f"Found {len(common_set)} common parts across {len(item_materials)} items: {list(item_materials.keys())}")
+            print(f"Found {len(common_rows)} common parts across {num_items} items: {sorted({k[0] for k in item_layer_materials})}")
             
             # Save to CSV
             os.makedirs(os.path.dirname(common_extract_path), exist_ok=True)
             with open(common_extract_path, 'w', newline='', encoding='utf-8-sig') as f:
-                writer = csv.writer(f)
-                writer.writerow(['Common_Material_Code'])
-                for mat in sorted(common_set):
-                    writer.writerow([mat])
+                writer = csv.DictWriter(f, fieldnames=COMMON_PART_FIELDS)
+                writer.writeheader()
+                writer.writerows(common_rows)
             
             print(f"Successfully saved common parts to: {common_extract_path}")
             
@@ -89,88 +180,75 @@ def main():
         
         return
 
+    # --- Mode 3: Select Common Materials for Spare Feeder Slots ---
+    if args.select_common is not None:
+        print(f"Selecting up to {args.select_common} common materials for spare feeder slots...")
+        try:
+            common_materials = load_common_materials(common_list_path)
+            item_layer_materials = load_bom(bom_path)
+            if args.items:
+                target_items = [x.strip() for x in args.items.split(',') if x.strip()]
+                item_layer_materials = {k: v for k, v in item_layer_materials.items() if k[0] in target_items}
+            if not item_layer_materials:
+                print("No data found in BOM.")
+                return
+
+            chosen, before, after = common_selection.select_common_materials(
+                item_layer_materials, common_materials, args.select_common)
+
+            print(f"Selected {len(chosen)} materials. Predicted changeovers: {before} -> {after} "
+                  f"(saves {before - after}).")
+            os.makedirs(os.path.dirname(proposal_path), exist_ok=True)
+            with open(proposal_path, 'w', newline='', encoding='utf-8-sig') as f:
+                writer = csv.DictWriter(f, fieldnames=common_selection.PROPOSAL_FIELDS)
+                writer.writeheader()
+                for mat in sorted(common_materials):
+                    writer.writerow({'Material_Code': mat, 'Source': 'current', 'Swap_Savings': ''})
+                for mat, gain in chosen:
+                    writer.writerow({'Material_Code': mat, 'Source': 'proposed', 'Swap_Savings': gain})
+            print(f"Successfully saved proposed common material list to: {proposal_path}")
+        except Exception as e:
+            print(f"Error selecting common materials: {e}")
+        return
+
     # --- Mode 2: Standard Analysis (Using common_material_list.csv) ---
     print("Loading data for analysis...")
 
     # 1. Load Common Materials from File
-    common_materials = set()
     try:
-        if os.path.exists(common_list_path):
-            with open(common_list_path, 'r', encoding='utf-8-sig') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if 'Material_Code' in row and row['Material_Code']:
-                        common_materials.add(row['Material_Code'].strip())
-            print(f"Loaded {len(common_materials)} common materials from {common_list_path}.")
-        else:
-            print(f"Warning: Common material file not found: {common_list_path}. Treating all materials as individual.")
+        common_materials = load_common_materials(common_list_path)
     except Exception as e:
         print(f"Error reading common material list: {e}")
         return
 
     # 2. Load BOM Data
-    item_layer_materials = {} # (Item_Code, Layer) -> Set of Material_Code
-    
     try:
-        with open(bom_path, 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                item_code = row.get('Item_Code', '').strip()
-                material_code = row.get('Material_Code', '').strip()
-                t_b_code = row.get('T_B', '').strip().upper()
-                
-                # Determine Layer
-                layer = "Unknown"
-                if t_b_code == "SB":
-                    layer = "Bottom"
-                elif t_b_code == "ST":
-                    layer = "Top"
-                
-                if item_code and material_code:
-                    key = (item_code, layer)
-                    if key not in item_layer_materials:
-                        item_layer_materials[key] = set()
-                    item_layer_materials[key].add(material_code)
-        
+        item_layer_materials = load_bom(bom_path)
         print(f"Loaded BOM data for {len(item_layer_materials)} item-layer combinations.")
     except Exception as e:
         print(f"Error reading BOM file: {e}")
         return
 
     # 3. Analyze and Output
-    results = []
+    results = analyze_materials(item_layer_materials, common_materials, joined=args.format == 'csv')
     print("\nAnalysis Result (Preview):")
     print("-" * 100)
     print(f"{'Item_Code':<20} | {'Layer':<10} | {'Common':<10} | {'Individual':<10}")
     print("-" * 100)
 
-    # Sort keys for consistent output
-    sorted_keys = sorted(item_layer_materials.keys())
-
-    for item, layer in sorted_keys:
-        materials = item_layer_materials[(item, layer)]
-        common_in_item = {m for m in materials if m in common_materials}
-        individual_in_item = materials - common_in_item
-        
-        results.append({
-            'Item_Code': item,
-            'Layer': layer,
-            'Common_Count': len(common_in_item),
-            'Individual_Count': len(individual_in_item),
-            'Common_Materials': ','.join(sorted(common_in_item)),
-            'Individual_Materials': ','.join(sorted(individual_in_item))
-        })
-
-        print(f"{item:<20} | {layer:<10} | {len(common_in_item):<10} | {len(individual_in_item):<10}")
+    for res in results:
+        print(f"{res['Item_Code']:<20} | {res['Layer']:<10} | {res['Common_Count']:<10} | {res['Individual_Count']:<10}")
 
     # 4. Save to CSV
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, 'w', newline='', encoding='utf-8-sig') as f:
-            fieldnames = ['Item_Code', 'Layer', 'Common_Count', 'Individual_Count', 'Common_Materials', 'Individual_Materials']
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(results)
+        if args.format == 'npz':
+            result_store.save_results(output_path, results)
+        else:
+            with open(output_path, 'w', newline='', encoding='utf-8-sig') as f:
+                writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+                writer.writeheader()
+                writer.writerows(results)
         print(f"\nSuccessfully saved detailed results to: {output_path}")
     except Exception as e:
         print(f"Error saving output file: {e}")
@@ -1,9 +1,25 @@
+import copy
 import csv
+import math
 import os
 import sys
 import argparse
-from ortools.constraint_solver import routing_enums_pb2
-from ortools.constraint_solver import pywrapcp
+import time
+
+import importlib.util
+
+import numpy as np
+
+import candidate_search
+import feeder_model
+import job_clustering
+import material_matrix
+import result_store
+import solution_cache
+
+# OR-Tools is optional: it is imported on first use, and the heuristic solver is used without it
+ORTOOLS_AVAILABLE = importlib.util.find_spec('ortools') is not None
+SOLVERS = ['auto', 'ortools', 'heuristic', 'lsh']
 
 def load_production_data(file_path):
     """Loads production data (Qty, Prod_Time) from item_list.txt."""
@@ -30,6 +46,8 @@ def load_production_data(file_path):
             except ValueError as e:
                 print(f"Error parsing headers in item_list.txt: {e}")
                 return prod_data
+            # Optional production line column
+            idx_line = headers.index('Line') if 'Line' in headers else None
 
             for line in f:
                 if not line.strip():
@@ -54,6 +72,8 @@ def load_production_data(file_path):
                         'Qty': qty,
                         'Prod_Time': prod_time
                     }
+                    if idx_line is not None and idx_line < len(parts):
+                        prod_data[(item_code, layer)]['Line'] = parts[idx_line]
         print(f"Loaded production data for {len(prod_data)} items.")
     except Exception as e:
         print(f"Error reading item_list.txt: {e}")
@@ -65,6 +85,25 @@ def parse_arguments():
     parser.add_argument('--priority', type=str, help='Comma-separated list of Item_Codes to prioritize.')
     parser.add_argument('--manual', type=str, help='Manual sequence definition (e.g. "(ItemA,Top), (ItemB,Bottom)")')
     parser.add_argument('--layer', type=str, choices=['TB', 'BT'], help='Prioritize specific layer order: TB (Top then Bottom) or BT (Bottom then Top).')
+    parser.add_argument('--time-per-job', type=float, default=0.05, help='Solver seconds per job in a segment (added to a 0.1 s base).')
+    parser.add_argument('--max-time', type=float, default=30.0, help='Maximum solver seconds for one segment.')
+    parser.add_argument('--stall-time', type=float, default=1.0, help='Stop a segment once the objective has not improved for this many seconds.')
+    parser.add_argument('--time-budget', type=float, help='Total solver wall-clock budget (seconds) for the whole run.')
+    parser.add_argument('--joint', action='store_true', help='Optimize priority and layer stages in one model (rank constraints) instead of one stage at a time.')
+    parser.add_argument('--feeder-slots', type=str, help='Feeder slots for individual materials, one count for all lines or per line (e.g. "S01:120,S02:100"; "*:120" for unlisted lines). Enables the feeder occupancy cost model.')
+    parser.add_argument('--lines', type=str, help='Comma-separated production lines (e.g. "S01,S02,S03,S04"). Assigns the jobs to the lines, balancing utilization, and sequences each line.')
+    parser.add_argument('--shift-minutes', type=int, default=SHIFT_MINUTES, help='Shift capacity of one line in minutes (multi-line and shift cut-off modes).')
+    parser.add_argument('--balance-weight', type=int, default=1, help='Cost of one minute of the busiest line, in material swaps (multi-line and shift cut-off modes).')
+    parser.add_argument('--shift-cutoff', type=str, choices=SHIFT_CUTOFFS, help='Sequence on the shift clock (Prod_Time + changeover minutes): soft = penalize overtime, hard = defer jobs that do not fit. Adds projected finish times to the output.')
+    parser.add_argument('--swap-minutes', type=float, default=SWAP_MINUTES, help='Minutes to change one individual material (changeover time = swaps x this).')
+    parser.add_argument('--previous', type=str, help='Previous optimization_sequence.csv to repair incrementally (warm start) instead of solving from scratch.')
+    parser.add_argument('--frozen', type=int, default=0, help='Number of jobs at the start of the previous sequence that have already started and must keep their place.')
+    parser.add_argument('--cache', action='store_true', help=f'Reuse the best route found for identical job sets from an on-disk solution cache (Output/{solution_cache.CACHE_DIR_NAME}).')
+    parser.add_argument('--cache-improve', action='store_true', help='With --cache, keep improving cached routes (normal time limit) instead of returning them directly.')
+    parser.add_argument('--cluster-size', type=int, help='Sequence segments larger than this hierarchically: cluster similar jobs (MinHash), sequence each cluster, then order and stitch the clusters.')
+    parser.add_argument('--cluster-workers', type=int, default=1, help='Processes sequencing clusters in parallel (with --cluster-size).')
+    parser.add_argument('--solver', type=str, choices=SOLVERS, default='auto', help='Sequencing backend: ortools, heuristic (NumPy 2-opt/Or-opt, no OR-Tools needed), lsh (matrix-free, LSH candidate lists, for thousands of jobs) or auto.')
+    parser.add_argument('--dp-threshold', type=int, default=DP_THRESHOLD, help=f'Solve segments with at most this many jobs exactly (Held-Karp, max {DP_MAX_JOBS}).')
     return parser.parse_args()
 
 def parse_manual_sequence(manual_str):
@@ -92,41 +131,336 @@ def parse_manual_sequence(manual_str):
         
     return items
 
-def solve_tsp(jobs, start_ref_job=None):
+MIN_TIME_LIMIT = 0.05 # Always leave time to build a first solution
+DP_THRESHOLD = 15 # Segments up to this many jobs are solved exactly with Held-Karp
+DP_MAX_JOBS = 18 # Held-Karp memory grows as 2^n * n
+LSH_MIN_JOBS = 2000 # From this size 'auto' uses the matrix-free LSH candidate-list solver
+SHIFT_MINUTES = 480 # One production day per line
+SWAP_MINUTES = 1.0 # Minutes to change one individual material on a feeder
+SHIFT_CUTOFFS = ['soft', 'hard']
+OVERTIME_PENALTY = 1000 # Cost per minute a line runs past its shift (multi-line mode)
+
+class SolverSettings:
+    """
+    Solver policy shared by every solve_tsp call of one run.
+
+    Segments of at most dp_threshold jobs are solved exactly (solve_path_dp). Larger ones
+    use OR-Tools routing, the built-in heuristic or the matrix-free LSH candidate-list
+    solver (solver: 'ortools', 'heuristic', 'lsh', or 'auto' = OR-Tools when installed,
+    LSH from LSH_MIN_JOBS jobs).
+
+    With feeder_slots (an int or Line -> int), the final sequence is further improved
+    against the simulated feeder load count (feeder_model) and annotated with it.
+
+    With shift_cutoff ('soft' or 'hard') or in multi-line mode, jobs are sequenced on a
+    shift clock of Prod_Time plus swap_minutes per material swap: every line gets
+    shift_minutes, overtime is penalized (soft) or the jobs that do not fit are deferred
+    (hard), and balance_weight is the cost of one minute of the busiest line's load
+    relative to one material swap.
+
+    Segments of more than cluster_size jobs are sequenced hierarchically
+    (job_clustering.solve_clustered), with the clusters solved in cluster_workers
+    processes.
+
+    With a cache (solution_cache.SolutionCache), every solved segment is looked up by
+    content first; cache_improve spends the normal time limit improving a cached route
+    instead of returning it directly.
+
+    Each call gets base_seconds + seconds_per_job * n (capped at max_seconds), clipped to
+    what is left of the optional run_budget, and stops early once the objective has not
+    improved for stall_seconds.
+    """
+    def __init__(self, base_seconds=0.1, seconds_per_job=0.05, max_seconds=30.0,
+                 stall_seconds=1.0, run_budget=None, dp_threshold=DP_THRESHOLD, solver='auto',
+                 feeder_slots=None, shift_minutes=SHIFT_MINUTES, balance_weight=1,
+                 shift_cutoff=None, swap_minutes=SWAP_MINUTES, cache=None, cache_improve=False,
+                 cluster_size=None, cluster_workers=1):
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown solver '{solver}' (expected one of {SOLVERS}).")
+        if solver == 'ortools' and not ORTOOLS_AVAILABLE:
+            raise ValueError("Solver 'ortools' requested but OR-Tools is not installed.")
+        self.solver = solver
+        if shift_cutoff not in SHIFT_CUTOFFS + [None]:
+            raise ValueError(f"Unknown shift cut-off '{shift_cutoff}' (expected one of {SHIFT_CUTOFFS}).")
+        self.feeder_slots = feeder_slots
+        self.shift_cutoff = shift_cutoff
+        self.swap_minutes = swap_minutes
+        self.cache = cache
+        self.cache_improve = cache_improve
+        self.cluster_size = cluster_size
+        self.cluster_workers = cluster_workers
+        self.shift_minutes = shift_minutes
+        self.balance_weight = balance_weight
+        self.dp_threshold = dp_threshold
+        self.base_seconds = base_seconds
+        self.seconds_per_job = seconds_per_job
+        self.max_seconds = max_seconds
+        self.stall_seconds = stall_seconds
+        self.run_budget = run_budget
+        self.deadline = None
+
+    def start_run(self):
+        """Starts the run wall-clock budget (if any)."""
+        if self.run_budget:
+            self.deadline = time.monotonic() + self.run_budget
+
+    def without_ortools(self):
+        """True when matrix-based segments use the built-in heuristic instead of OR-Tools."""
+        return self.solver in ('heuristic', 'lsh') or (self.solver == 'auto' and not ORTOOLS_AVAILABLE)
+
+    def flat(self):
+        """Copy of these settings without hierarchical clustering."""
+        flat = copy.copy(self)
+        flat.cluster_size = None
+        return flat
+
+    def time_limit(self, num_jobs):
+        """Seconds available for a segment of num_jobs jobs."""
+        limit = min(self.base_seconds + self.seconds_per_job * num_jobs, self.max_seconds)
+        if self.deadline is not None:
+            limit = min(limit, self.deadline - time.monotonic())
+        return max(limit, MIN_TIME_LIMIT)
+
+def solve_tsp(jobs, start_ref_job=None, settings=None):
     """
     Solves TSP for a list of jobs.
     """
+    if settings is None:
+        settings = SolverSettings()
+
     if not jobs:
         return []
     
     if len(jobs) == 1:
         return [0]
 
-    # Calculate distance matrix (symmetric difference)
-    num_jobs = len(jobs)
+    if settings.cluster_size and len(jobs) > settings.cluster_size:
+        return job_clustering.solve_clustered(jobs, start_ref_job, settings)
+
+    start_ref_set = start_ref_job['Individual_Set'] if start_ref_job else None
+    if len(jobs) > min(settings.dp_threshold, DP_MAX_JOBS) and (
+            settings.solver == 'lsh' or (settings.solver == 'auto' and len(jobs) >= LSH_MIN_JOBS)):
+        # No n x n matrix (and so no solution cache, which keys on it)
+        return candidate_search.solve_candidates([job['Individual_Set'] for job in jobs], start_ref_set, settings)
+
+    # Calculate distance matrix (symmetric difference, vectorized over bit-packed sets)
     # 0 is the depot (dummy or start ref), 1..n are actual jobs
-    num_nodes = num_jobs + 1 
-    distance_matrix = [[0] * num_nodes for _ in range(num_nodes)]
-
-    for i in range(num_jobs):
-        # Distance from Depot to Job i
-        if start_ref_job:
-            cost = len(start_ref_job['Individual_Set'].symmetric_difference(jobs[i]['Individual_Set']))
-            distance_matrix[0][i+1] = cost
-        else:
-            distance_matrix[0][i+1] = 0
-            
-        # Distance from Job i to Depot
-        distance_matrix[i+1][0] = 0
+    distance_matrix = material_matrix.changeover_matrix(
+        [job['Individual_Set'] for job in jobs], start_ref_set)
+
+    return solve_cached(jobs, distance_matrix, settings,
+                        lambda initial_order: solve_path(distance_matrix, settings, initial_order))
+
+def solve_path(distance_matrix, settings, initial_order=None):
+    """
+    Solves an open path problem with the backend of the settings: Held-Karp up to
+    dp_threshold jobs, else the heuristic or OR-Tools (from initial_order when given).
+    """
+    num_jobs = len(distance_matrix) - 1
+    if num_jobs <= min(settings.dp_threshold, DP_MAX_JOBS):
+        return solve_path_dp(distance_matrix)
+    if settings.without_ortools():
+        if initial_order is not None:
+            return improve_path(distance_matrix, initial_order, time.monotonic() + settings.time_limit(num_jobs))
+        return solve_path_heuristic(distance_matrix, settings)
+    return solve_routing(distance_matrix.tolist(), settings, initial_order=initial_order)
+
+def path_cost(distance_matrix, order):
+    """Changeover cost of a job order on the open path from the depot."""
+    nodes = [0] + [i + 1 for i in order]
+    return int(sum(distance_matrix[a][b] for a, b in zip(nodes, nodes[1:])))
+
+def solve_cached(jobs, distance_matrix, settings, solve, ranks=None):
+    """
+    Runs solve(initial_order) through the solution cache of the settings (if any).
+    A cached route for the same jobs, materials, start and ranks is returned as is or,
+    with settings.cache_improve, handed to solve as the initial solution; the better of
+    the cached and the new route is kept. Jobs with duplicate keys are never cached.
+    """
+    keys = [(job.get('Item_Code'), job.get('Layer')) for job in jobs]
+    if settings.cache is None or len(set(keys)) != len(keys):
+        return solve(None)
+
+    key = solution_cache.problem_key(jobs, distance_matrix[0, 1:], ranks)
+    position = {k: i for i, k in enumerate(keys)}
+    cached = settings.cache.get(key)
+    cached_order = None
+    if cached and len(cached) == len(keys) and all(k in position for k in cached):
+        cached_order = [position[k] for k in cached]
+        # Exact (Held-Karp) routes cannot improve
+        if not settings.cache_improve or len(jobs) <= min(settings.dp_threshold, DP_MAX_JOBS):
+            return cached_order
+
+    order = solve(cached_order)
+    if order is None:
+        return None
+    if cached_order is not None and path_cost(distance_matrix, cached_order) <= path_cost(distance_matrix, order):
+        return cached_order
+    settings.cache.put(key, [keys[i] for i in order])
+    return order
+
+def solve_path_dp(distance_matrix):
+    """
+    Exact Held-Karp DP for the open path that starts at the depot (node 0) and visits
+    every job once (returning to the depot is free). States are processed one subset
+    size at a time, vectorized over all subsets of that size.
+    Returns the optimal job order (indices into the job list, i.e. node - 1).
+    """
+    dist = np.asarray(distance_matrix, dtype=np.int64)
+    n = dist.shape[0] - 1
+    inf = np.iinfo(np.int64).max // 4
+    num_masks = 1 << n
+    job_dist = dist[1:, 1:]
 
-        for j in range(num_jobs):
-            if i == j:
-                distance_matrix[i+1][j+1] = 0
+    cost = np.full((num_masks, n), inf, dtype=np.int64) # cost[mask, j]: best path over mask ending at j
+    parent = np.full((num_masks, n), -1, dtype=np.int64)
+    singles = 1 << np.arange(n)
+    cost[singles, np.arange(n)] = dist[0, 1:]
+
+    masks = np.arange(num_masks)
+    sizes = np.zeros(num_masks, dtype=np.int64)
+    for j in range(n):
+        sizes += (masks >> j) & 1
+
+    for size in range(2, n + 1):
+        layer = masks[sizes == size]
+        for j in range(n):
+            ends_j = layer[(layer >> j) & 1 == 1]
+            prev = ends_j ^ (1 << j)
+            cand = cost[prev] + job_dist[:, j][None, :]
+            best = np.argmin(cand, axis=1)
+            cost[ends_j, j] = cand[np.arange(len(ends_j)), best]
+            parent[ends_j, j] = best
+
+    full = num_masks - 1
+    last = int(np.argmin(cost[full] + dist[1:, 0]))
+    order = []
+    mask = full
+    while last != -1:
+        order.append(last)
+        prev_last = int(parent[mask, last])
+        mask ^= 1 << last
+        last = prev_last
+    order.reverse()
+    return order
+
+def solve_path_heuristic(distance_matrix, settings):
+    """
+    OR-Tools-free solver for the open path from the depot (node 0): nearest-neighbour
+    construction, then 2-opt and Or-opt (segments of 1-3 jobs, optionally reversed)
+    moves evaluated with NumPy until no move improves or the time limit is reached.
+    Returns the job order (indices into the job list, i.e. node - 1).
+    """
+    dist = np.asarray(distance_matrix, dtype=np.int64)
+    deadline = time.monotonic() + settings.time_limit(dist.shape[0] - 1)
+    return improve_path(dist, [i - 1 for i in nearest_neighbour_path(dist)], deadline)
+
+def improve_path(distance_matrix, order, deadline):
+    """
+    2-opt / Or-opt local search from a given job order (indices into the job list) of
+    the open path from the depot, until no move improves or the deadline passes.
+    Returns the improved job order.
+    """
+    dist = np.asarray(distance_matrix, dtype=np.int64)
+    n = dist.shape[0] - 1
+
+    # Extended matrix with an END node (n + 1): leaving the last job is free
+    end = n + 1
+    ext = np.zeros((n + 2, n + 2), dtype=np.int64)
+    ext[:n + 1, :n + 1] = dist
+
+    path = [i + 1 for i in order]
+
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = two_opt_pass(path, ext, end, deadline)
+        improved = or_opt_pass(path, ext, end, deadline) or improved
+
+    return [node - 1 for node in path]
+
+def nearest_neighbour_path(dist):
+    """Greedy path from the depot, always moving to the cheapest unvisited job (job nodes 1..n)."""
+    n = dist.shape[0] - 1
+    visited = np.zeros(n + 1, dtype=bool)
+    visited[0] = True
+    path = []
+    current = 0
+    for _ in range(n):
+        row = np.where(visited, np.iinfo(np.int64).max, dist[current])
+        current = int(np.argmin(row))
+        visited[current] = True
+        path.append(current)
+    return path
+
+def two_opt_pass(path, ext, end, deadline):
+    """
+    One sweep of 2-opt: for each start position, reverse the segment path[i..k] with the
+    best gain (all k evaluated at once). Job-to-job costs are symmetric, so only the two
+    boundary arcs change. Modifies path in place; returns True if it improved.
+    """
+    improved = False
+    n = len(path)
+    for i in range(n - 1):
+        if time.monotonic() >= deadline:
+            break
+        full = np.array([0] + path + [end])
+        a, first = full[i], full[i + 1]
+        lasts = full[i + 2:n + 1]   # candidate segment ends (k > i)
+        nexts = full[i + 3:n + 2]
+        delta = (ext[a, lasts] + ext[first, nexts]) - (ext[a, first] + ext[lasts, nexts])
+        k = int(np.argmin(delta))
+        if delta[k] < 0:
+            path[i:i + k + 2] = path[i:i + k + 2][::-1]
+            improved = True
+    return improved
+
+def or_opt_pass(path, ext, end, deadline):
+    """
+    One sweep of Or-opt: move each segment of 1-3 jobs (as is or reversed) to the gap
+    with the best gain (all gaps evaluated at once). Modifies path in place; returns
+    True if it improved.
+    """
+    improved = False
+    for seg_len in (1, 2, 3):
+        i = 0
+        while i + seg_len <= len(path):
+            if time.monotonic() >= deadline:
+                return improved
+            full = [0] + path + [end]
+            prev, nxt = full[i], full[i + seg_len + 1]
+            seg = path[i:i + seg_len]
+            s_first, s_last = seg[0], seg[-1]
+            removal_gain = ext[prev, s_first] + ext[s_last, nxt] - ext[prev, nxt]
+
+            rest = np.array([0] + path[:i] + path[i + seg_len:] + [end])
+            us, vs = rest[:-1], rest[1:]
+            insert_fwd = ext[us, s_first] + ext[s_last, vs] - ext[us, vs]
+            insert_rev = ext[us, s_last] + ext[s_first, vs] - ext[us, vs]
+            insert_fwd[i] = insert_rev[i] = np.iinfo(np.int64).max # original gap (no-op)
+
+            gap_fwd, gap_rev = int(np.argmin(insert_fwd)), int(np.argmin(insert_rev))
+            if insert_rev[gap_rev] < insert_fwd[gap_fwd]:
+                gap, cost, seg = gap_rev, insert_rev[gap_rev], seg[::-1]
             else:
-                s1 = jobs[i]['Individual_Set']
-                s2 = jobs[j]['Individual_Set']
-                cost = len(s1.symmetric_difference(s2))
-                distance_matrix[i+1][j+1] = cost
+                gap, cost = gap_fwd, insert_fwd[gap_fwd]
+
+            if cost < removal_gain:
+                rest_path = path[:i] + path[i + seg_len:]
+                path[:] = rest_path[:gap] + seg + rest_path[gap:]
+                improved = True
+            else:
+                i += 1
+    return improved
+
+def solve_routing(distance_matrix, settings, ranks=None, initial_order=None, budget_jobs=None):
+    """
+    Solves the open path over distance_matrix (node 0 = depot) with OR-Tools routing.
+    ranks: optional rank per job; jobs are then visited in non-decreasing rank order.
+    initial_order: optional feasible job order to start the local search from.
+    budget_jobs: size the time limit for this many jobs instead of all of them.
+    Returns the job order (indices into the job list, i.e. node - 1).
+    """
+    from ortools.constraint_solver import pywrapcp
 
     # Create Data Model
     data = {}
@@ -138,37 +472,323 @@ def solve_tsp(jobs, start_ref_job=None):
                                            data['num_vehicles'], data['depot'])
     routing = pywrapcp.RoutingModel(manager)
 
-    def distance_callback(from_index, to_index):
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        return data['distance_matrix'][from_node][to_node]
-
-    transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+    # Hand the matrix to OR-Tools so arc costs are evaluated natively (no Python callback per arc)
+    transit_callback_index = routing.RegisterTransitMatrix(data['distance_matrix'])
     routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
+    if ranks:
+        add_rank_dimension(routing, manager, ranks)
+
+    search_parameters = routing_search_parameters(settings, budget_jobs or len(distance_matrix) - 1, ranks)
+    stall_callback = add_stall_stop(routing, settings)
+
+    solution = solve_from_routes(routing, search_parameters, [initial_order] if initial_order else None)
+    
+    if solution:
+        return extract_routes(routing, manager, solution, 1)[0]
+    else:
+        print("No solution found for subset.")
+        return list(range(len(distance_matrix) - 1)) # Fallback
+
+def add_rank_dimension(routing, manager, ranks):
+    """
+    Rank dimension: zero transit plus slack, so cumuls can only grow along a route.
+    Pinning each job's cumul to its rank forces lower ranks to be visited first.
+    """
+    max_rank = max(ranks)
+    zero_callback_index = routing.RegisterUnaryTransitVector([0] * (len(ranks) + 1))
+    routing.AddDimension(zero_callback_index, max_rank, max_rank, True, 'Rank')
+    rank_dimension = routing.GetDimensionOrDie('Rank')
+    for node, rank in enumerate(ranks, start=1):
+        rank_dimension.CumulVar(manager.NodeToIndex(node)).SetValue(rank)
+
+def routing_search_parameters(settings, num_jobs, ranks=None):
+    """Search parameters of the routing solvers (time limit from settings)."""
+    from ortools.constraint_solver import routing_enums_pb2
+    from ortools.constraint_solver import pywrapcp
+
     search_parameters = pywrapcp.DefaultRoutingSearchParameters()
     search_parameters.first_solution_strategy = (
         routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC)
-    search_parameters.time_limit.seconds = 5
+    if ranks:
+        # Path-building strategies dead-end on the pinned rank cumuls; insertion does not
+        search_parameters.first_solution_strategy = (
+            routing_enums_pb2.FirstSolutionStrategy.LOCAL_CHEAPEST_INSERTION)
+    search_parameters.local_search_metaheuristic = (
+        routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH)
+    search_parameters.time_limit.FromMilliseconds(int(settings.time_limit(num_jobs) * 1000))
+    return search_parameters
 
-    solution = routing.SolveWithParameters(search_parameters)
-    
-    if solution:
-        # Extract solution (indices in 'jobs' list)
+def add_stall_stop(routing, settings):
+    """
+    Early stop: finishes the search once the objective has not improved for
+    settings.stall_seconds. Returns the callback (keep a reference while solving).
+    """
+    progress = {'best': None, 'last_improvement': time.monotonic()}
+
+    def on_solution():
+        cost = routing.CostVar().Value()
+        now = time.monotonic()
+        if progress['best'] is None or cost < progress['best']:
+            progress['best'] = cost
+            progress['last_improvement'] = now
+        elif now - progress['last_improvement'] > settings.stall_seconds:
+            routing.solver().FinishCurrentSearch()
+
+    routing.AddAtSolutionCallback(on_solution)
+    return on_solution
+
+def solve_from_routes(routing, search_parameters, initial_routes=None):
+    """
+    Solves the model, starting from initial_routes (job indices per vehicle) when given
+    and feasible. Returns the solution or None.
+    """
+    solution = None
+    if initial_routes:
+        routing.CloseModelWithParameters(search_parameters)
+        initial_assignment = routing.ReadAssignmentFromRoutes(
+            [[i + 1 for i in route] for route in initial_routes], True)
+        if initial_assignment:
+            solution = routing.SolveFromAssignmentWithParameters(initial_assignment, search_parameters)
+    if solution is None:
+        solution = routing.SolveWithParameters(search_parameters)
+    return solution
+
+def extract_routes(routing, manager, solution, num_vehicles):
+    """Job indices (node - 1) visited by each vehicle, in order."""
+    routes = []
+    for vehicle in range(num_vehicles):
         ordered_indices = []
-        index = routing.Start(0)
+        index = routing.Start(vehicle)
         while not routing.IsEnd(index):
             node_index = manager.IndexToNode(index)
             if node_index != 0:
                 ordered_indices.append(node_index - 1)
             index = solution.Value(routing.NextVar(index))
-            
-        return ordered_indices
+        routes.append(ordered_indices)
+    return routes
+
+def job_minutes(job):
+    """Production minutes of a job (Prod_Time; 0 when unknown)."""
+    try:
+        return float(job.get('Prod_Time') or 0)
+    except ValueError:
+        return 0.0
+
+def time_matrix(distance_matrix, minutes, swap_minutes):
+    """
+    Integer minute transits of the Time dimension: leaving node i for node j takes i's
+    production time plus the changeover to j (material swaps x swap_minutes).
+    The cumul at a job is then its production start, and at a route end the line's finish.
+    """
+    service = np.concatenate(([0.0], minutes))
+    transit = service[:, None] + distance_matrix * swap_minutes
+    return np.ceil(transit).astype(np.int64)
+
+def shift_cutoff_routes(routes, distance_matrix, minutes, settings):
+    """
+    Hard shift cut-off of given routes: walking each route, a job whose projected finish
+    would pass settings.shift_minutes is deferred. Returns (routes, deferred indices).
+    """
+    kept_routes = []
+    deferred = []
+    for route in routes:
+        kept = []
+        clock = 0.0
+        prev = 0
+        for i in route:
+            finish = clock + distance_matrix[prev, i + 1] * settings.swap_minutes + minutes[i]
+            if finish > settings.shift_minutes:
+                deferred.append(i)
+                continue
+            kept.append(i)
+            clock = finish
+            prev = i + 1
+        kept_routes.append(kept)
+    return kept_routes, deferred
+
+def solve_multi_line(jobs, lines, settings, ranks=None):
+    """
+    Assigns jobs to production lines and sequences every line in one routing model.
+
+    Each line is a vehicle starting from the depot (no reference job). Arc costs are the
+    material changeovers; a 'Time' dimension accumulates Prod_Time plus changeover minutes
+    (swaps x settings.swap_minutes). Each line's finish is held to settings.shift_minutes,
+    either softly (OVERTIME_PENALTY per minute over) or, with shift_cutoff 'hard', strictly
+    by deferring the jobs that do not fit. A global span cost (settings.balance_weight per
+    minute of the busiest line) balances line utilization. ranks: optional rank per job,
+    enforced on every line.
+
+    Without OR-Tools (or with the heuristic solver) the jobs are spread by longest
+    Prod_Time first onto the least-loaded line and each line is sequenced on its own.
+    Returns (Line -> ordered job indices, deferred job indices).
+    """
+    distance_matrix = material_matrix.changeover_matrix([job['Individual_Set'] for job in jobs])
+    minutes = [job_minutes(job) for job in jobs]
+    line_ranks = ranks or [0] * len(jobs)
+    hard = settings.shift_cutoff == 'hard'
+
+    # Longest job first onto the least-loaded line, then sequence each line
+    loads = [0] * len(lines)
+    members = [[] for _ in lines]
+    for i in sorted(range(len(jobs)), key=lambda i: -minutes[i]):
+        v = loads.index(min(loads))
+        members[v].append(i)
+        loads[v] += minutes[i]
+    initial_routes = []
+    for v_members in members:
+        nodes = np.array([0] + [m + 1 for m in v_members])
+        sub_order = staged_order(distance_matrix[np.ix_(nodes, nodes)],
+                                 [line_ranks[m] for m in v_members], settings)
+        initial_routes.append([v_members[i] for i in sub_order])
+    initial_deferred = []
+    if hard:
+        initial_routes, initial_deferred = shift_cutoff_routes(initial_routes, distance_matrix, minutes, settings)
+
+    if settings.without_ortools():
+        return dict(zip(lines, initial_routes)), initial_deferred
+
+    from ortools.constraint_solver import pywrapcp
+
+    manager = pywrapcp.RoutingIndexManager(len(distance_matrix), len(lines), 0)
+    routing = pywrapcp.RoutingModel(manager)
+
+    transit_callback_index = routing.RegisterTransitMatrix(distance_matrix.tolist())
+    routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
+
+    transit_minutes = time_matrix(distance_matrix, minutes, settings.swap_minutes)
+    time_callback_index = routing.RegisterTransitMatrix(transit_minutes.tolist())
+    if hard:
+        routing.AddDimension(time_callback_index, 0, settings.shift_minutes, True, 'Time')
+        # A job may be left out (deferred) only when it cannot fit any line's shift: dropping
+        # one costs more than all arcs plus the largest span cost (spans are capped by the shift)
+        drop_penalty = ((int(distance_matrix.max()) + 1) * (len(jobs) + 1)
+                        + settings.balance_weight * settings.shift_minutes * len(lines))
+        for node in range(1, len(distance_matrix)):
+            routing.AddDisjunction([manager.NodeToIndex(node)], drop_penalty)
     else:
-        print("No solution found for subset.")
-        return list(range(len(jobs))) # Fallback
+        # The hard capacity never binds; overtime is priced instead
+        routing.AddDimension(time_callback_index, 0, max(int(transit_minutes.sum()), settings.shift_minutes),
+                             True, 'Time')
+    time_dimension = routing.GetDimensionOrDie('Time')
+    if not hard:
+        for v in range(len(lines)):
+            time_dimension.SetCumulVarSoftUpperBound(routing.End(v), settings.shift_minutes, OVERTIME_PENALTY)
+    time_dimension.SetGlobalSpanCostCoefficient(settings.balance_weight)
+
+    if ranks:
+        add_rank_dimension(routing, manager, ranks)
+
+    search_parameters = routing_search_parameters(settings, len(jobs), ranks)
+    stall_callback = add_stall_stop(routing, settings)
+
+    solution = solve_from_routes(routing, search_parameters, initial_routes)
+    if not solution:
+        print("No multi-line solution found; using the load-balanced assignment.")
+        return dict(zip(lines, initial_routes)), initial_deferred
+    routes = extract_routes(routing, manager, solution, len(lines))
+    visited = {i for route in routes for i in route}
+    deferred = [i for i in range(len(jobs)) if i not in visited]
+    return dict(zip(lines, routes)), deferred
+
+def annotate_finish_times(sequence, settings):
+    """
+    Stores each job's projected Changeover_Minutes (material swaps from the previous job
+    x settings.swap_minutes) and Finish_Minutes (minutes from the start of the line's
+    shift). The clock restarts at every line start; deferred jobs get no finish time.
+    """
+    clock = 0.0
+    prev_set = None
+    for i, job in enumerate(sequence):
+        if job.get('Is_Deferred'):
+            job['Changeover_Minutes'] = ''
+            job['Finish_Minutes'] = ''
+            continue
+        if i == 0 or job.get('Is_Line_Start'):
+            clock = 0.0
+            prev_set = None
+        changeover = 0.0
+        if prev_set is not None:
+            changeover = len(prev_set ^ job['Individual_Set']) * settings.swap_minutes
+        clock += changeover + job_minutes(job)
+        job['Changeover_Minutes'] = round(changeover, 1)
+        job['Finish_Minutes'] = round(clock, 1)
+        prev_set = job['Individual_Set']
+
+def job_rank(job, priority_codes, layer_mode):
+    """
+    Rank of a job in the staged order: priority jobs before the rest and, within each
+    stage, the layer groups in layer_mode order (other layers last).
+    """
+    stage = 0 if job.get('Item_Code') in priority_codes else 1
+    group = 0
+    if layer_mode:
+        first_layer, second_layer = ('Top', 'Bottom') if layer_mode == 'TB' else ('Bottom', 'Top')
+        if job['Layer'] == first_layer:
+            group = 0
+        elif job['Layer'] == second_layer:
+            group = 1
+        else:
+            group = 2
+    return stage * 3 + group
 
-def optimize_segment(jobs, layer_mode, start_ref_job=None):
+def solve_ranked(jobs, ranks, settings=None):
+    """
+    Sequences all jobs in one model, with the stage order encoded as rank constraints
+    (a job may only follow jobs of the same or a lower rank).
+    Small instances use Held-Karp with a penalty on rank-decreasing arcs; larger ones use
+    an OR-Tools rank dimension. Returns the job order, or None when the selected
+    backend cannot handle rank constraints (heuristic solver).
+    """
+    if settings is None:
+        settings = SolverSettings()
+
+    if not jobs:
+        return []
+
+    if len(set(ranks)) == 1:
+        return solve_tsp(jobs, None, settings)
+
+    distance_matrix = material_matrix.changeover_matrix([job['Individual_Set'] for job in jobs])
+
+    def solve(initial_order):
+        if len(jobs) <= min(settings.dp_threshold, DP_MAX_JOBS):
+            # Any rank-decreasing arc costs more than a whole path without one
+            penalty = int(distance_matrix.max()) * len(jobs) + 1
+            rank_arr = np.array(ranks)
+            penalized = distance_matrix.copy()
+            penalized[1:, 1:] += penalty * (rank_arr[None, :] < rank_arr[:, None])
+            return solve_path_dp(penalized)
+
+        if settings.without_ortools():
+            return None
+        # Start from the stage-by-stage order so the joint search can only improve on it
+        if initial_order is None:
+            initial_order = staged_order(distance_matrix, ranks, settings)
+        return solve_routing(distance_matrix.tolist(), settings, ranks=ranks, initial_order=initial_order)
+
+    return solve_cached(jobs, distance_matrix, settings, solve, ranks)
+
+def staged_order(distance_matrix, ranks, settings):
+    """
+    Quick stage-by-stage order: each rank group (ascending) is sequenced on its own with
+    Held-Karp or the heuristic solver, starting from the previous group's last job.
+    """
+    order = []
+    for rank in sorted(set(ranks)):
+        members = [i for i, r in enumerate(ranks) if r == rank]
+        nodes = np.array([0] + [m + 1 for m in members])
+        sub_matrix = distance_matrix[np.ix_(nodes, nodes)]
+        if order:
+            sub_matrix[0, 1:] = distance_matrix[order[-1] + 1, nodes[1:]]
+        if len(members) <= min(settings.dp_threshold, DP_MAX_JOBS):
+            sub_order = solve_path_dp(sub_matrix)
+        else:
+            sub_order = solve_path_heuristic(sub_matrix, settings)
+        order.extend(members[i] for i in sub_order)
+    return order
+
+def optimize_segment(jobs, layer_mode, start_ref_job=None, settings=None):
     """
     Optimizes a segment of jobs, optionally splitting by layer.
     Returns: List of ordered jobs.
@@ -178,7 +798,7 @@ def optimize_segment(jobs, layer_mode, start_ref_job=None):
 
     if not layer_mode:
         # No layer priority, optimize as one block
-        indices = solve_tsp(jobs, start_ref_job)
+        indices = solve_tsp(jobs, start_ref_job, settings)
         return [jobs[i] for i in indices]
     
     # Split by Layer
@@ -201,7 +821,7 @@ def optimize_segment(jobs, layer_mode, start_ref_job=None):
     
     # 1. Optimize First Group
     if first_group:
-        indices = solve_tsp(first_group, current_ref)
+        indices = solve_tsp(first_group, current_ref, settings)
         ordered_first = [first_group[i] for i in indices]
         ordered_segment.extend(ordered_first)
         if ordered_first:
@@ -209,7 +829,7 @@ def optimize_segment(jobs, layer_mode, start_ref_job=None):
             
     # 2. Optimize Second Group
     if second_group:
-        indices = solve_tsp(second_group, current_ref)
+        indices = solve_tsp(second_group, current_ref, settings)
         ordered_second = [second_group[i] for i in indices]
         ordered_segment.extend(ordered_second)
         if ordered_second:
@@ -217,12 +837,128 @@ def optimize_segment(jobs, layer_mode, start_ref_job=None):
             
     # 3. Optimize Others (if any, append at end)
     if others:
-        indices = solve_tsp(others, current_ref)
+        indices = solve_tsp(others, current_ref, settings)
         ordered_others = [others[i] for i in indices]
         ordered_segment.extend(ordered_others)
         
     return ordered_segment
 
+def load_previous_sequence(file_path):
+    """Reads the (Item_Code, Layer) order of a previous optimization_sequence.csv."""
+    keys = []
+    if not os.path.exists(file_path):
+        print(f"Warning: Previous sequence file not found: {file_path}")
+        return keys
+    try:
+        with open(file_path, 'r', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                if row.get('Item_Code') and row.get('Layer'):
+                    keys.append((row['Item_Code'].strip(), row['Layer'].strip()))
+        print(f"Loaded previous sequence of {len(keys)} jobs.")
+    except Exception as e:
+        print(f"Error reading previous sequence: {e}")
+    return keys
+
+def incremental_conflict(lines, shift_cutoff):
+    """
+    Why a previous sequence cannot be repaired with these options, or None: resequence
+    keeps a single sequence, so it neither assigns lines nor defers jobs at the cut-off.
+    """
+    if lines:
+        return "Incremental re-sequencing (--previous) cannot be combined with line assignment (--lines)."
+    if shift_cutoff == 'hard':
+        return "Incremental re-sequencing (--previous) cannot be combined with --shift-cutoff hard."
+    return None
+
+def resequence(jobs, previous_keys, frozen_count=0, priority_codes=None, layer_mode=None, settings=None):
+    """
+    Incremental re-sequencing: repairs a previous sequence (list of (Item_Code, Layer))
+    instead of solving from scratch.
+
+    The first frozen_count jobs of the previous sequence (already started) keep their
+    place. Jobs no longer present are removed and new ones are inserted at their
+    cheapest position that keeps the priority/layer stage order. Only then is the open
+    part improved, warm-started from the repaired order, with a time limit sized by the
+    number of changed jobs. An unchanged job set returns the previous order as is.
+    Returns the final ordered list of jobs.
+    """
+    if settings is None:
+        settings = SolverSettings()
+    priority_codes = priority_codes or []
+
+    jobs_map = {(j['Item_Code'], j['Layer']): j for j in jobs}
+    previous = [key for key in dict.fromkeys(previous_keys) if key in jobs_map]
+    frozen_keys = set(previous_keys[:frozen_count])
+    frozen = [jobs_map[key] for key in previous if key in frozen_keys]
+    open_jobs = [jobs_map[key] for key in previous if key not in frozen_keys]
+    previous_set = set(previous)
+    added = [job for job in jobs if (job['Item_Code'], job['Layer']) not in previous_set]
+    num_removed = len(set(previous_keys) - set(jobs_map))
+    print(f"Incremental re-sequencing: {len(frozen)} frozen, {len(added)} added, {num_removed} removed jobs.")
+
+    candidates = open_jobs + added
+    ranks = [job_rank(job, priority_codes, layer_mode) for job in candidates]
+    # The previous order may predate a priority/layer change: restore the stage order
+    order = sorted(range(len(open_jobs)), key=lambda i: ranks[i])
+
+    if (added or num_removed or order != list(range(len(open_jobs)))) and len(candidates) > 1:
+        start_ref_set = frozen[-1]['Individual_Set'] if frozen else None
+        distance_matrix = material_matrix.changeover_matrix(
+            [job['Individual_Set'] for job in candidates], start_ref_set)
+        for i in range(len(open_jobs), len(candidates)):
+            order = insert_cheapest(distance_matrix, order, i, ranks)
+        order = improve_order(distance_matrix, order, ranks, settings, len(added) + num_removed)
+
+    final_sequence = []
+    for job in frozen:
+        job['Is_Frozen'] = True
+        job['Is_Priority'] = job.get('Item_Code') in priority_codes
+        final_sequence.append(job)
+    for i in order:
+        job = candidates[i]
+        job['Is_Priority'] = job.get('Item_Code') in priority_codes
+        final_sequence.append(job)
+    return final_sequence
+
+def insert_cheapest(distance_matrix, order, job, ranks):
+    """
+    Inserts job (an index into the job list) into order at the cheapest gap that keeps
+    the ranks non-decreasing. Returns the new order.
+    """
+    node = job + 1
+    path = np.array([0] + [i + 1 for i in order])
+    path_ranks = np.array([-1] + [ranks[i] for i in order] + [max(ranks) + 1])
+    # Gap g lies between path[g] and path[g + 1] (or after the last job)
+    added_cost = distance_matrix[path, node].astype(np.int64)
+    added_cost[:-1] += distance_matrix[node, path[1:]] - distance_matrix[path[:-1], path[1:]]
+    feasible = (path_ranks[:-1] <= ranks[job]) & (ranks[job] <= path_ranks[1:])
+    gap = int(np.argmin(np.where(feasible, added_cost, np.iinfo(np.int64).max)))
+    return order[:gap] + [job] + order[gap:]
+
+def improve_order(distance_matrix, order, ranks, settings, num_changed):
+    """
+    Improves a repaired job order, given a time limit sized for num_changed jobs:
+    OR-Tools warm-started from the order, or else 2-opt/Or-opt within each rank block.
+    """
+    staged = len(set(ranks)) > 1
+    if not settings.without_ortools():
+        return solve_routing(distance_matrix.tolist(), settings, ranks=ranks if staged else None,
+                             initial_order=order, budget_jobs=max(num_changed, 1))
+
+    deadline = time.monotonic() + settings.time_limit(max(num_changed, 1))
+    improved = []
+    start = 0
+    for k in range(1, len(order) + 1):
+        if k < len(order) and ranks[order[k]] == ranks[order[start]]:
+            continue
+        block = order[start:k]
+        nodes = np.array([improved[-1] + 1 if improved else 0] + [i + 1 for i in block])
+        sub_matrix = distance_matrix[np.ix_(nodes, nodes)]
+        sub_matrix[:, 0] = 0
+        improved.extend(block[i] for i in improve_path(sub_matrix, list(range(len(block))), deadline))
+        start = k
+    return improved
+
 def load_common_materials(file_path):
     """Loads common materials from csv file into a set."""
     common_set = set()
@@ -243,15 +979,331 @@ def load_common_materials(file_path):
         
     return common_set
 
+def build_jobs(result_rows, common_materials_set=None):
+    """
+    Builds job dicts from optimize_plan result rows, adding 'Individual_Set'.
+    Individual_Materials may be a comma-joined string (CSV) or an iterable of codes.
+    """
+    jobs = []
+    for row in result_rows:
+        row = dict(row)
+        ind_val = row.get('Individual_Materials', '')
+        if isinstance(ind_val, str):
+            ind_set = set(x.strip() for x in ind_val.replace('"', '').split(',') if x.strip())
+        else:
+            ind_set = set(ind_val)
+
+        # Explicitly remove common materials if they exist in valid set
+        if common_materials_set:
+            ind_set = ind_set.difference(common_materials_set)
+
+        row['Individual_Set'] = ind_set
+        jobs.append(row)
+    return jobs
+
+def merge_production_data(jobs, prod_data):
+    """Merges Qty / Prod_Time from production data into each job."""
+    for job in jobs:
+        key = (job.get('Item_Code'), job.get('Layer'))
+        if key in prod_data:
+            job.update(prod_data[key])
+        else:
+            job['Qty'] = ''
+            job['Prod_Time'] = ''
+    return jobs
+
+def sequence_jobs(jobs, priority_codes=None, layer_mode=None, manual_keys=None, settings=None, joint=False,
+                  lines=None, previous_keys=None, frozen_count=0):
+    """
+    Orders jobs either by a manual sequence or by optimization (Priority + Layer).
+    settings: SolverSettings of the run (its run budget starts here).
+    joint: optimize all stages in one model (solve_ranked) instead of stage by stage.
+    lines: production lines to assign the jobs to (optimize_lines); the result then
+           lists each line's sequence in turn.
+    previous_keys / frozen_count: repair this previous sequence, keeping its first
+           frozen_count jobs in place (resequence), instead of solving from scratch
+           (ValueError with lines or a hard shift cut-off, see incremental_conflict).
+    Returns the final ordered list of jobs (empty if a manual sequence had no valid jobs).
+    """
+    if settings is None:
+        settings = SolverSettings()
+    settings.start_run()
+
+    if settings.feeder_slots:
+        # Fail before solving when a line the sequence can use has no feeder slot count
+        used_lines = {line for line in lines or [] if line}
+        if not lines or settings.shift_cutoff == 'hard':
+            used_lines |= {feeder_model.job_line(job) for job in jobs}
+        for line in sorted(used_lines):
+            feeder_model.slots_for_line(settings.feeder_slots, line)
+
+    if manual_keys:
+        final_sequence = []
+        jobs_map = {(j['Item_Code'], j['Layer']): j for j in jobs}
+
+        for key in manual_keys:
+            if key in jobs_map:
+                job = jobs_map[key]
+                job['Is_Manual'] = True
+                final_sequence.append(job)
+            else:
+                print(f"Warning: Manual Item {key} not found in loaded data. Skipping.")
+        if settings.feeder_slots:
+            feeder_model.annotate_feeder_loads(final_sequence, settings.feeder_slots)
+        if settings.shift_cutoff:
+            annotate_finish_times(final_sequence, settings)
+        return final_sequence
+
+    # Optimization Mode (Priority + Layer)
+    priority_codes = priority_codes or []
+    time_aware = bool(lines or settings.shift_cutoff)
+    if previous_keys:
+        conflict = incremental_conflict(lines, settings.shift_cutoff)
+        if conflict:
+            raise ValueError(conflict)
+        final_sequence = resequence(jobs, previous_keys, frozen_count, priority_codes, layer_mode, settings)
+    elif time_aware:
+        final_sequence = optimize_lines(jobs, lines or [None], priority_codes, layer_mode, settings)
+    else:
+        final_sequence = optimize_stages(jobs, priority_codes, layer_mode, settings, joint)
+
+    if settings.feeder_slots and final_sequence:
+        before = feeder_model.sequence_feeder_cost(final_sequence, settings.feeder_slots)
+        # Jobs only move within their stage of their line (and deferred block); frozen jobs stay
+        block_keys = [('Frozen', i) if job.get('Is_Frozen') else
+                      (job.get('Line'), job.get('Is_Deferred', False), job_rank(job, priority_codes, layer_mode))
+                      for i, job in enumerate(final_sequence)]
+        final_sequence = feeder_model.improve_feeder_sequence(
+            final_sequence, settings.feeder_slots, block_keys=block_keys,
+            time_limit=settings.time_limit(len(final_sequence)))
+        after = feeder_model.sequence_feeder_cost(final_sequence, settings.feeder_slots)
+        print(f"Feeder model: {before} -> {after} material loads.")
+        feeder_model.annotate_feeder_loads(final_sequence, settings.feeder_slots)
+
+    if time_aware:
+        annotate_finish_times(final_sequence, settings)
+        print_line_finish(final_sequence, settings)
+
+    return final_sequence
+
+def print_line_finish(sequence, settings):
+    """Prints each line's projected finish and utilization of the shift."""
+    finish = {}
+    for job in sequence:
+        if job.get('Finish_Minutes') != '':
+            finish[job.get('Line') or 'Sequence'] = job['Finish_Minutes']
+    for line, minutes in finish.items():
+        print(f"  {line}: finishes at {minutes} min ({minutes / settings.shift_minutes * 100:.1f}% of {settings.shift_minutes} min)")
+
+def optimize_stages(jobs, priority_codes, layer_mode, settings, joint=False):
+    """Optimizes the priority and remaining stages (see sequence_jobs)."""
+    final_sequence = []
+
+    if joint:
+        print(f"Optimizing {len(jobs)} jobs jointly (Priority: {len(priority_codes)} items, LayerMode: {layer_mode})...")
+        ranks = [job_rank(job, priority_codes, layer_mode) for job in jobs]
+        indices = solve_ranked(jobs, ranks, settings)
+        if indices is not None:
+            for i in indices:
+                job = jobs[i]
+                job['Is_Priority'] = job.get('Item_Code') in priority_codes
+                final_sequence.append(job)
+            return final_sequence
+        print("Joint mode needs the exact or OR-Tools solver; falling back to stage-by-stage optimization.")
+
+    prio_jobs = []
+    remaining_jobs = []
+
+    for job in jobs:
+        if job.get('Item_Code') in priority_codes:
+            prio_jobs.append(job)
+        else:
+            remaining_jobs.append(job)
+
+    current_ref_job = None
+
+    # Stage 1: Priority Jobs
+    if prio_jobs:
+        print(f"Optimizing {len(prio_jobs)} priority jobs (LayerMode: {layer_mode})...")
+        # Optimize segment (handles layer split internally)
+        ordered_prio = optimize_segment(prio_jobs, layer_mode, start_ref_job=None, settings=settings)
+
+        for job in ordered_prio:
+            job['Is_Priority'] = True
+            final_sequence.append(job)
+
+        if final_sequence:
+            current_ref_job = final_sequence[-1]
+
+    # Stage 2: Remaining Jobs
+    if remaining_jobs:
+        print(f"Optimizing {len(remaining_jobs)} remaining jobs (LayerMode: {layer_mode})...")
+        ordered_rem = optimize_segment(remaining_jobs, layer_mode, start_ref_job=current_ref_job, settings=settings)
+
+        for job in ordered_rem:
+            job['Is_Priority'] = False
+            final_sequence.append(job)
+
+    return final_sequence
+
+def optimize_lines(jobs, lines, priority_codes, layer_mode, settings):
+    """
+    Assigns the jobs to lines and sequences each line on the shift clock
+    (solve_multi_line), keeping the priority/layer stage order within every line.
+    lines: line names, or [None] for one line that keeps each job's own Line.
+    Sets job['Line'] and marks the first job of each line with Is_Line_Start; jobs
+    deferred by a hard shift cut-off follow at the end, marked Is_Deferred.
+    """
+    print(f"Optimizing {len(jobs)} jobs across lines {', '.join(line or 'Sequence' for line in lines)} "
+          f"(Priority: {len(priority_codes)} items, LayerMode: {layer_mode})...")
+    ranks = None
+    if priority_codes or layer_mode:
+        ranks = [job_rank(job, priority_codes, layer_mode) for job in jobs]
+    routes, deferred = solve_multi_line(jobs, lines, settings, ranks)
+
+    final_sequence = []
+    for line in lines:
+        for pos, i in enumerate(routes[line]):
+            job = jobs[i]
+            if line is not None:
+                job['Line'] = line
+            job['Is_Line_Start'] = pos == 0
+            job['Is_Priority'] = job.get('Item_Code') in priority_codes
+            final_sequence.append(job)
+
+    if deferred:
+        print(f"  {len(deferred)} jobs do not fit in the {settings.shift_minutes} min shift and are deferred.")
+        deferred_jobs = [jobs[i] for i in deferred]
+        for pos, i in enumerate(solve_tsp(deferred_jobs, None, settings)):
+            job = deferred_jobs[i]
+            job['Is_Line_Start'] = pos == 0
+            job['Is_Priority'] = job.get('Item_Code') in priority_codes
+            job['Is_Deferred'] = True
+            final_sequence.append(job)
+    return final_sequence
+
+OPTIONAL_RESULT_FIELDS = ['Feeder_Loads', 'Changeover_Minutes', 'Finish_Minutes']
+
+def build_result_rows(jobs, final_sequence):
+    """
+    Builds the output rows (with reasoning) for a final sequence.
+    Returns (fieldnames, rows).
+    """
+    base_fields = [k for k in jobs[0].keys() if k != 'Individual_Set' and k != 'Index' and k != 'Transition_Shared_Count' and k != 'Selection_Reason' and k != 'Is_Priority' and k != 'Is_Manual' and k != 'Is_Line_Start' and k != 'Is_Deferred' and k != 'Is_Frozen' and k != 'Total_Count'] 
+    # Fields added during sequencing (e.g. Feeder_Loads) are on the sequenced jobs
+    for job in final_sequence[:1]:
+        base_fields += [k for k in job.keys() if k in OPTIONAL_RESULT_FIELDS and k not in base_fields]
+    
+    ordered_base_fields = []
+    priority_fields_list = ['Item_Code', 'Layer']
+    if 'Line' in base_fields:
+        priority_fields_list.append('Line')
+    priority_fields_list += ['Qty', 'Prod_Time', 'Total_Count', 'Common_Count', 'Individual_Count', 'Transition_Shared_Count']
+    # Optional columns, only present when the matching option was used
+    priority_fields_list += [f for f in OPTIONAL_RESULT_FIELDS if f in base_fields]
+    priority_fields_list.append('Selection_Reason')
+    
+    for pf in priority_fields_list:
+        if pf in base_fields:
+            ordered_base_fields.append(pf)
+            base_fields.remove(pf)
+        else:
+            # If it's a new field not in jobs[0] (like Total_Count), we just add it to our columns list
+            # But we need to make sure it's in fieldnames
+            ordered_base_fields.append(pf)
+
+    ordered_base_fields.extend(base_fields)
+
+    fieldnames = ['Index'] + ordered_base_fields
+    rows = []
+    
+    for i, current_job in enumerate(final_sequence):
+        # Calculate stats
+        try:
+            c_count = int(current_job.get('Common_Count', 0))
+            i_count = int(current_job.get('Individual_Count', 0))
+            total_count = c_count + i_count
+        except ValueError:
+            c_count = 0
+            i_count = 0
+            total_count = 0
+        shared_count = 0
+        reason = ""
+        
+        # Each line's sequence starts fresh in multi-line mode
+        is_start = i == 0 or current_job.get('Is_Line_Start')
+        prev_job = final_sequence[i-1] if not is_start else None
+        
+        if current_job.get('Is_Deferred'):
+            reason = "교대 시간 내 생산 불가로 다음 교대로 이월됨 (Deferred)."
+            if not is_start:
+                shared_count = len(current_job.get('Individual_Set', set()).intersection(prev_job.get('Individual_Set', set())))
+        elif current_job.get('Is_Frozen'):
+            reason = "이미 생산이 시작된 작업으로 순서 고정 (Frozen)."
+            if not is_start:
+                shared_count = len(current_job.get('Individual_Set', set()).intersection(prev_job.get('Individual_Set', set())))
+        elif is_start:
+            if current_job.get('Is_Manual'):
+                reason = "사용자 지정 수동 순서 (Manual Sequence)"
+            elif current_job.get('Is_Priority'):
+                reason = "사용자 요청에 의한 우선 생산 모델 (Priority)"
+            else:
+                reason = "전체 생산 일정의 자재 교체 비용을 최소화하기 위한 최적의 시작점으로 선정됨."
+            shared_count = 0
+        else:
+            # Intersection (Shared Count) logic
+            current_set = current_job.get('Individual_Set', set())
+            prev_set = prev_job.get('Individual_Set', set())
+            intersection = current_set.intersection(prev_set)
+            shared_count = len(intersection)
+            
+            prev_item = prev_job.get('Item_Code', 'Unknown')
+            
+            if current_job.get('Is_Manual'):
+                 # Logic asked: "Same count calculation"
+                 reason = f"이전 생산 모델 ({prev_item})과 개별 자재 {shared_count}개가 동일함 (Manual Evaluation)."
+            elif current_job.get('Is_Priority'):
+                 reason = f"사용자 요청에 의한 우선 생산 모델 (Priority). 이전 모델과 개별 자재 {shared_count}개 동일."
+            else:
+                 reason = f"이전 생산 모델 ({prev_item})과 개별 자재 {shared_count}개가 동일하여 생산 효율성을 위해 배치함 (전체 자재 {total_count}개, 공통 자재 {c_count}개)."
+
+        # Clean up internal keys (material lists from the columnar result are joined for output)
+        out_row = {k: ','.join(v) if isinstance(v, (list, tuple)) else v
+                   for k, v in current_job.items() if k in fieldnames}
+        out_row['Index'] = i + 1
+        out_row['Transition_Shared_Count'] = shared_count
+        out_row['Selection_Reason'] = reason
+        out_row['Total_Count'] = total_count # Calculated in the previous block
+        
+        rows.append(out_row)
+
+    return fieldnames, rows
+
 def main():
     args = parse_arguments()
+    if args.previous:
+        conflict = incremental_conflict(args.lines, args.shift_cutoff)
+        if conflict:
+            print(f"Error: {conflict}")
+            return
+    try:
+        feeder_slots = feeder_model.parse_feeder_slots(args.feeder_slots)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
     
     base_dir = "."
     input_path = os.path.join(base_dir, "Output", "optimization_result.csv")
+    columnar_path = os.path.join(base_dir, "Output", "optimization_result.npz")
     item_list_path = os.path.join(base_dir, "Input", "item_list.txt")
     common_mat_path = os.path.join(base_dir, "Input", "common_material_list.csv")
     output_path = os.path.join(base_dir, "Output", "optimization_sequence.csv")
 
+    # Read the columnar result unless the CSV one is newer
+    if os.path.exists(columnar_path) and (not os.path.exists(input_path)
+                                          or os.path.getmtime(columnar_path) >= os.path.getmtime(input_path)):
+        input_path = columnar_path
+
     if not os.path.exists(input_path):
         print(f"Error: Input file not found: {input_path}")
         return
@@ -260,23 +1312,12 @@ def main():
     common_materials_set = load_common_materials(common_mat_path)
 
     # 1. Load Jobs
-    jobs = []
     try:
-        with open(input_path, 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                ind_str = row.get('Individual_Materials', '')
-                if ind_str:
-                    ind_set = set(x.strip() for x in ind_str.replace('"', '').split(',') if x.strip())
-                else:
-                    ind_set = set()
-                
-                # Explicitly remove common materials if they exist in valid set
-                if common_materials_set:
-                    ind_set = ind_set.difference(common_materials_set)
-                
-                row['Individual_Set'] = ind_set
-                jobs.append(row)
+        if input_path == columnar_path:
+            jobs = build_jobs(result_store.load_results(input_path), common_materials_set)
+        else:
+            with open(input_path, 'r', encoding='utf-8-sig') as f:
+                jobs = build_jobs(csv.DictReader(f), common_materials_set)
         print(f"Loaded {len(jobs)} jobs from optimization result.")
     except Exception as e:
         print(f"Error reading input file: {e}")
@@ -288,148 +1329,49 @@ def main():
 
     # 1.5 Load and Merge Production Data
     prod_data = load_production_data(item_list_path)
-    for job in jobs:
-        key = (job.get('Item_Code'), job.get('Layer'))
-        if key in prod_data:
-            job.update(prod_data[key])
-        else:
-            job['Qty'] = ''
-            job['Prod_Time'] = ''
-
-    # Define final sequence
-    final_sequence = []
+    merge_production_data(jobs, prod_data)
 
     # 2. Logic Branch
+    manual_keys = None
+    priority_codes = []
     if args.manual:
         print(f"Processing Manual Sequence: {args.manual}")
         manual_keys = parse_manual_sequence(args.manual)
-        jobs_map = {(j['Item_Code'], j['Layer']): j for j in jobs}
-        
-        for key in manual_keys:
-            if key in jobs_map:
-                job = jobs_map[key]
-                job['Is_Manual'] = True 
-                final_sequence.append(job)
-            else:
-                print(f"Warning: Manual Item {key} not found in loaded data. Skipping.")
-        
-        if not final_sequence:
-            print("Error: No valid jobs found in manual sequence.")
-            return
+    elif args.priority:
+        priority_codes = [x.strip() for x in args.priority.split(',') if x.strip()]
+        print(f"Priority Items: {priority_codes}")
 
-    else:
-        # Optimization Mode (Priority + Layer)
-        
-        # Split by Priority Item Codes
-        priority_codes = []
-        if args.priority:
-            priority_codes = [x.strip() for x in args.priority.split(',') if x.strip()]
-            print(f"Priority Items: {priority_codes}")
-        
-        prio_jobs = []
-        remaining_jobs = []
-        
-        for job in jobs:
-            if job.get('Item_Code') in priority_codes:
-                prio_jobs.append(job)
-            else:
-                remaining_jobs.append(job)
-        
-        current_ref_job = None
-        
-        # Stage 1: Priority Jobs
-        if prio_jobs:
-            print(f"Optimizing {len(prio_jobs)} priority jobs (LayerMode: {args.layer})...")
-            # Optimize segment (handles layer split internally)
-            ordered_prio = optimize_segment(prio_jobs, args.layer, start_ref_job=None)
-            
-            for job in ordered_prio:
-                job['Is_Priority'] = True
-                final_sequence.append(job)
-            
-            if final_sequence:
-                current_ref_job = final_sequence[-1]
-        
-        # Stage 2: Remaining Jobs
-        if remaining_jobs:
-            print(f"Optimizing {len(remaining_jobs)} remaining jobs (LayerMode: {args.layer})...")
-            ordered_rem = optimize_segment(remaining_jobs, args.layer, start_ref_job=current_ref_job)
-            
-            for job in ordered_rem:
-                job['Is_Priority'] = False
-                final_sequence.append(job)
+    cache = None
+    if args.cache:
+        cache = solution_cache.SolutionCache(os.path.join(base_dir, "Output", solution_cache.CACHE_DIR_NAME))
+    settings = SolverSettings(seconds_per_job=args.time_per_job, max_seconds=args.max_time,
+                              stall_seconds=args.stall_time, run_budget=args.time_budget,
+                              dp_threshold=args.dp_threshold, solver=args.solver,
+                              feeder_slots=feeder_slots,
+                              shift_minutes=args.shift_minutes, balance_weight=args.balance_weight,
+                              shift_cutoff=args.shift_cutoff, swap_minutes=args.swap_minutes,
+                              cache=cache, cache_improve=args.cache_improve,
+                              cluster_size=args.cluster_size, cluster_workers=args.cluster_workers)
+    lines = [x.strip() for x in args.lines.split(',') if x.strip()] if args.lines else None
+    previous_keys = load_previous_sequence(args.previous) if args.previous else None
+    try:
+        final_sequence = sequence_jobs(jobs, priority_codes, args.layer, manual_keys, settings, joint=args.joint,
+                                       lines=lines, previous_keys=previous_keys, frozen_count=args.frozen)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    if args.manual and not final_sequence:
+        print("Error: No valid jobs found in manual sequence.")
+        return
 
     # 3. Save Result with Reasoning
     try:
+        fieldnames, rows = build_result_rows(jobs, final_sequence)
         with open(output_path, 'w', newline='', encoding='utf-8-sig') as f:
-            base_fields = [k for k in jobs[0].keys() if k != 'Individual_Set' and k != 'Index' and k != 'Transition_Shared_Count' and k != 'Selection_Reason' and k != 'Is_Priority' and k != 'Is_Manual' and k != 'Total_Count'] 
-            
-            ordered_base_fields = []
-            priority_fields_list = ['Item_Code', 'Layer', 'Qty', 'Prod_Time', 'Total_Count', 'Common_Count', 'Individual_Count', 'Transition_Shared_Count', 'Selection_Reason']
-            
-            for pf in priority_fields_list:
-                if pf in base_fields:
-                    ordered_base_fields.append(pf)
-                    base_fields.remove(pf)
-                else:
-                    # If it's a new field not in jobs[0] (like Total_Count), we just add it to our columns list
-                    # But we need to make sure it's in fieldnames
-                    ordered_base_fields.append(pf)
-
-            ordered_base_fields.extend(base_fields)
-
-            fieldnames = ['Index'] + ordered_base_fields
             writer = csv.DictWriter(f, fieldnames=fieldnames)
             writer.writeheader()
-            
-            for i, current_job in enumerate(final_sequence):
-                # Calculate stats
-                try:
-                    c_count = int(current_job.get('Common_Count', 0))
-                    i_count = int(current_job.get('Individual_Count', 0))
-                    total_count = c_count + i_count
-                except ValueError:
-                    c_count = 0
-                    i_count = 0
-                    total_count = 0
-                shared_count = 0
-                reason = ""
-                
-                prev_job = final_sequence[i-1] if i > 0 else None
-                
-                if i == 0:
-                    if current_job.get('Is_Manual'):
-                        reason = "사용자 지정 수동 순서 (Manual Sequence)"
-                    elif current_job.get('Is_Priority'):
-                        reason = "사용자 요청에 의한 우선 생산 모델 (Priority)"
-                    else:
-                        reason = "전체 생산 일정의 자재 교체 비용을 최소화하기 위한 최적의 시작점으로 선정됨."
-                    shared_count = 0
-                else:
-                    # Intersection (Shared Count) logic
-                    current_set = current_job.get('Individual_Set', set())
-                    prev_set = prev_job.get('Individual_Set', set())
-                    intersection = current_set.intersection(prev_set)
-                    shared_count = len(intersection)
-                    
-                    prev_item = prev_job.get('Item_Code', 'Unknown')
-                    
-                    if current_job.get('Is_Manual'):
-                         # Logic asked: "Same count calculation"
-                         reason = f"이전 생산 모델 ({prev_item})과 개별 자재 {shared_count}개가 동일함 (Manual Evaluation)."
-                    elif current_job.get('Is_Priority'):
-                         reason = f"사용자 요청에 의한 우선 생산 모델 (Priority). 이전 모델과 개별 자재 {shared_count}개 동일."
-                    else:
-                         reason = f"이전 생산 모델 ({prev_item})과 개별 자재 {shared_count}개가 동일하여 생산 효율성을 위해 배치함 (전체 자재 {total_count}개, 공통 자재 {c_count}개)."
-
-                # Clean up internal keys
-                out_row = {k: v for k, v in current_job.items() if k in fieldnames}
-                out_row['Index'] = i + 1
-                out_row['Transition_Shared_Count'] = shared_count
-                out_row['Selection_Reason'] = reason
-                out_row['Total_Count'] = total_count # Calculated in the previous block
-                
-                writer.writerow(out_row)
+            writer.writerows(rows)
                 
         print(f"Successfully saved sequenced results to: {output_path}")
     except Exception as e:
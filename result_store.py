@@ -0,0 +1,56 @@
+import numpy as np
+
+import material_matrix
+
+MATERIAL_FIELDS = ['Common_Materials', 'Individual_Materials']
+
+def save_results(path, results):
+    """
+    Writes optimize_plan result rows to a columnar .npz file: one interned Material_Code
+    dictionary plus, per material field, CSR-style integer arrays (row offsets and
+    material ids). Material fields must be iterables of codes (not joined strings).
+    """
+    # Sorted dictionary: ascending ids are ascending codes
+    index = material_matrix.MaterialIndex(sorted({m for row in results for field in MATERIAL_FIELDS
+                                                  for m in row[field]}))
+    arrays = {
+        'item_codes': np.array([row['Item_Code'] for row in results], dtype=str),
+        'layers': np.array([row['Layer'] for row in results], dtype=str),
+    }
+    for field in MATERIAL_FIELDS:
+        encoded = [index.encode(row[field]) for row in results]
+        offsets = np.zeros(len(results) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(ids) for ids in encoded])
+        arrays[f'{field}_offsets'] = offsets
+        arrays[f'{field}_ids'] = (np.concatenate(encoded) if encoded else np.zeros(0)).astype(np.int32)
+    arrays['materials'] = np.array(index.codes, dtype=str)
+    np.savez_compressed(path, **arrays)
+
+def load_results(path):
+    """
+    Reads a file written by save_results back into result rows (Item_Code, Layer,
+    Common_Count, Individual_Count and the material fields as tuples of codes).
+    """
+    with np.load(path) as data:
+        materials = data['materials'].tolist()
+        columns = {}
+        for field in MATERIAL_FIELDS:
+            offsets = data[f'{field}_offsets'].tolist()
+            ids = data[f'{field}_ids'].tolist()
+            columns[field] = [tuple(materials[i] for i in ids[start:end])
+                              for start, end in zip(offsets[:-1], offsets[1:])]
+        keys = list(zip(data['item_codes'].tolist(), data['layers'].tolist()))
+
+    rows = []
+    for n, (item, layer) in enumerate(keys):
+        common = columns['Common_Materials'][n]
+        individual = columns['Individual_Materials'][n]
+        rows.append({
+            'Item_Code': item,
+            'Layer': layer,
+            'Common_Count': len(common),
+            'Individual_Count': len(individual),
+            'Common_Materials': common,
+            'Individual_Materials': individual
+        })
+    return rows
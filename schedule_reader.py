@@ -0,0 +1,315 @@
+import datetime
+import hashlib
+import importlib.util
+import json
+import math
+import os
+import pickle
+
+import openpyxl
+import pandas as pd
+
+# pyarrow is optional: snapshots are Feather files with it, pickle files without
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+SNAPSHOT_DIR_NAME = ".schedule_cache"
+SNAPSHOT_VERSION = 3
+MAX_SNAPSHOTS = 20
+HEADER_ROW = 36 # Schedule header at Excel row 37 (when it names the Item / Code columns)
+# Cell strings read as missing, as pandas.read_excel does by default
+NA_STRINGS = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+              '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'}
+
+def is_header_row(values):
+    """True when a row names the item columns (a cell containing 'Item' or 'Code')."""
+    return any("Item" in str(x) or "Code" in str(x) for x in values)
+
+def date_name(col):
+    """
+    YYYY-MM-DD name of a date column header, or None when it is not a date (dates up to
+    2000 are ignored, so that plain numbers are not mistaken for dates).
+    """
+    if isinstance(col, (datetime.datetime, datetime.date)):
+        return pd.Timestamp(col).strftime('%Y-%m-%d')
+    try:
+        dt = pd.to_datetime(str(col), errors='coerce')
+    except (ValueError, TypeError, OverflowError):
+        return None
+    if not pd.isna(dt) and dt.year > 2000:
+        return dt.strftime('%Y-%m-%d')
+    return None
+
+def clean_cell(value):
+    """Cell value as pandas.read_excel reads it: NA strings to None, whole floats to int."""
+    if isinstance(value, str):
+        return None if value in NA_STRINGS else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def column_names(header):
+    """Header cells as unique column names (Unnamed: i for empty cells, .1, .2 for repeats)."""
+    names = []
+    seen = {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None else value
+        if name in seen:
+            base = name
+            while name in seen:
+                seen[base] += 1
+                name = f"{base}.{seen[base]}"
+        seen[name] = 0
+        names.append(name)
+    return names
+
+def parse_schedule(rows):
+    """
+    Builds the schedule DataFrame from the sheet's rows (tuples of cell values) in one
+    pass: rows are buffered only until the header row is known (HEADER_ROW if it names
+    the item columns, else the first row), later rows are cleaned as they stream in.
+    Date columns are renamed to YYYY-MM-DD.
+    Returns (DataFrame, list of date column indices).
+    """
+    buffered = [] # Rows until the header row is known
+    header = None
+    data = []
+    for r_idx, values in enumerate(rows):
+        values = [clean_cell(v) for v in values]
+        while values and values[-1] is None:
+            values.pop()
+        if header is not None:
+            data.append(values)
+            continue
+        buffered.append(values)
+        if r_idx == HEADER_ROW:
+            header_row = HEADER_ROW if is_header_row(values) else 0
+            header = buffered[header_row]
+            data = buffered[header_row + 1:]
+    if header is None:
+        # Sheet shorter than HEADER_ROW rows: the first row is the header
+        header = buffered[0] if buffered else []
+        data = buffered[1:]
+
+    # Trailing empty rows are dropped, short rows padded
+    while data and not data[-1]:
+        data.pop()
+    width = max([len(header)] + [len(values) for values in data])
+
+    columns = []
+    date_cols = []
+    for i, col in enumerate(column_names(header + [None] * (width - len(header)))):
+        name = date_name(col)
+        if name is not None:
+            date_cols.append(i)
+        columns.append(col if name is None else name)
+
+    # Column-wise, so that each column gets its own inferred type (missing cells NaN)
+    df = pd.DataFrame({i: pd.Series([values[i] if i < len(values) and values[i] is not None else math.nan
+                                     for values in data], dtype=None if data else float)
+                       for i in range(width)})
+    df.columns = columns
+    return df, date_cols
+
+def file_hash(file_path):
+    """SHA-1 of a file's content."""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class SnapshotStore:
+    """
+    Binary snapshots of normalized schedules (parse_schedule results), one per source
+    workbook content in cache_dir: <SHA-1 of the xlsx>.feather when pyarrow is installed
+    and every column has an Arrow type (read back memory-mapped), else <SHA-1>.pkl.
+
+    last.json names, per workbook path, the snapshot of the version opened last
+    (open_schedule), which is the diff baseline of its next open, also in a later
+    session. A file's mtime is its last use: beyond max_entries snapshots, the least
+    recently used ones are removed.
+    """
+    def __init__(self, cache_dir, max_entries=MAX_SNAPSHOTS):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+
+    def _path(self, digest, ext):
+        return os.path.join(self.cache_dir, f"{digest}.{ext}")
+
+    def load(self, digest):
+        """Returns (DataFrame, date column indices) of a snapshot, or None."""
+        for ext in ('feather', 'pkl'):
+            path = self._path(digest, ext)
+            if not os.path.exists(path):
+                continue
+            try:
+                if ext == 'feather':
+                    if not PYARROW_AVAILABLE:
+                        continue
+                    from pyarrow import feather
+                    table = feather.read_table(path, memory_map=True)
+                    meta = json.loads(table.schema.metadata[b'schedule'])
+                    df = table.to_pandas()
+                    for i in meta['object_cols']:
+                        # Arrow reads back missing cells of object columns as None, parse_schedule has NaN
+                        col = df.iloc[:, i].astype(object)
+                        df.isetitem(i, col.where(col.notna(), math.nan))
+                    for i in meta['pickled_cols']:
+                        df.isetitem(i, pd.Series([pickle.loads(v) for v in df.iloc[:, i]], dtype=object))
+                    df.columns = meta['columns']
+                    data = {'version': meta['version'], 'df': df, 'date_cols': meta['date_cols']}
+                else:
+                    with open(path, 'rb') as f:
+                        data = pickle.load(f)
+                os.utime(path) # Mark as recently used
+            except Exception as e:
+                print(f"Warning: Ignoring unreadable schedule snapshot {path}: {e}")
+                continue
+            if data.get('version') == SNAPSHOT_VERSION:
+                return data['df'], list(data['date_cols'])
+        return None
+
+    def save(self, digest, df, date_cols):
+        """Stores the snapshot of a workbook version."""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if not (PYARROW_AVAILABLE and self._save_feather(digest, df, date_cols)):
+                path = self._path(digest, 'pkl')
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump({'version': SNAPSHOT_VERSION, 'df': df, 'date_cols': date_cols}, f,
+                                protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            self._evict()
+        except OSError as e:
+            print(f"Warning: Could not save schedule snapshot in {self.cache_dir}: {e}")
+
+    def _save_feather(self, digest, df, date_cols):
+        """
+        Writes an uncompressed (memory-mappable) Feather snapshot. Object columns without
+        an Arrow type (mixed cell types, e.g. numbers and text) are stored as pickled cells.
+        False if the frame still has no Arrow schema.
+        """
+        import pyarrow as pa
+        from pyarrow import feather
+        # Arrow needs string column names; the real ones (unique, may be numbers) go to the metadata
+        columns = list(df.columns)
+        df = df.set_axis([str(i) for i in range(df.shape[1])], axis=1)
+        object_cols = []
+        pickled_cols = []
+        for i, dtype in enumerate(df.dtypes):
+            if dtype != object:
+                continue
+            try:
+                pa.array(df.iloc[:, i], from_pandas=True)
+                object_cols.append(i)
+            except (TypeError, ValueError):
+                pickled_cols.append(i)
+                df.isetitem(i, pd.Series([pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL) for v in df.iloc[:, i]],
+                                         dtype=object))
+        try:
+            meta = json.dumps({'version': SNAPSHOT_VERSION, 'columns': columns, 'date_cols': date_cols,
+                               'object_cols': object_cols, 'pickled_cols': pickled_cols})
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (TypeError, ValueError): # Non-JSON column names
+            return False
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'schedule': meta.encode('utf-8')})
+        path = self._path(digest, 'feather')
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+        return True
+
+    def _read_last(self):
+        try:
+            with open(os.path.join(self.cache_dir, "last.json"), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def last(self, file_path):
+        """SHA-1 of the version of a workbook opened last, or None."""
+        digest = self._read_last().get(os.path.abspath(file_path))
+        return digest if isinstance(digest, str) else None
+
+    def set_last(self, digest, file_path):
+        last = self._read_last()
+        last[os.path.abspath(file_path)] = digest
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(os.path.join(self.cache_dir, "last.json"), 'w', encoding='utf-8') as f:
+                json.dump(last, f, indent=1)
+        except OSError as e:
+            print(f"Warning: Could not save schedule snapshot index in {self.cache_dir}: {e}")
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.feather') or name.endswith('.pkl'):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    entries.append((os.stat(path).st_mtime_ns, path))
+                except OSError:
+                    continue
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def snapshot_store(file_path):
+    """SnapshotStore of the folder of a workbook."""
+    return SnapshotStore(os.path.join(os.path.dirname(os.path.abspath(file_path)), SNAPSHOT_DIR_NAME))
+
+_cache = {} # Absolute path -> (mtime_ns, size, SHA-1, DataFrame, date column indices)
+
+def _load(file_path):
+    """(SHA-1, DataFrame, date column indices) of a workbook, from memory, a snapshot or the xlsx."""
+    st = os.stat(file_path)
+    key = os.path.abspath(file_path)
+    entry = _cache.get(key)
+    if entry is None or entry[0] != st.st_mtime_ns or entry[1] != st.st_size:
+        digest = file_hash(file_path)
+        store = snapshot_store(file_path)
+        snapshot = store.load(digest)
+        if snapshot is None:
+            workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                sheet = workbook.worksheets[0]
+                sheet.reset_dimensions() # Stored dimensions may be wrong; read all rows
+                snapshot = parse_schedule(sheet.iter_rows(values_only=True))
+            finally:
+                workbook.close()
+            store.save(digest, *snapshot)
+        entry = (st.st_mtime_ns, st.st_size, digest) + tuple(snapshot)
+        _cache[key] = entry
+    return entry[2], entry[3], entry[4]
+
+def read_schedule(file_path):
+    """
+    Reads the first sheet of a schedule workbook in one streaming pass (openpyxl
+    read-only mode, see parse_schedule). The result is kept in memory while the file's
+    mtime and size are unchanged, and as a binary snapshot (SnapshotStore) keyed by the
+    file's content, so re-opening the same file does not parse it again.
+    Returns (DataFrame copy, list of date column indices).
+    """
+    _, df, date_cols = _load(file_path)
+    return df.copy(), list(date_cols)
+
+def open_schedule(file_path):
+    """
+    read_schedule for opening a schedule in the planner: also returns the version of the
+    same workbook opened before (its snapshot, so across sessions too) as the diff
+    baseline, and makes this one the baseline of the next open.
+    Returns (DataFrame copy, date column indices, baseline DataFrame or None).
+    """
+    digest, df, date_cols = _load(file_path)
+    store = snapshot_store(file_path)
+    last = store.last(file_path)
+    baseline = store.load(last) if last else None
+    store.set_last(digest, file_path)
+    return df.copy(), list(date_cols), baseline[0] if baseline else None
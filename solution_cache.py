@@ -0,0 +1,80 @@
+import hashlib
+import os
+import pickle
+
+CACHE_DIR_NAME = ".solution_cache"
+CACHE_VERSION = 1
+MAX_ENTRIES = 2000
+
+def problem_key(jobs, start_costs, ranks=None):
+    """
+    Content hash of a sequencing problem: each job's (Item_Code, Layer) and material set,
+    its changeover cost from the start (depot row, i.e. the reference job) and its rank.
+    Independent of the order of the jobs.
+    """
+    if ranks is None:
+        ranks = [0] * len(jobs)
+    entries = sorted(
+        (str(job.get('Item_Code')), str(job.get('Layer')), tuple(sorted(job['Individual_Set'])), int(cost), int(rank))
+        for job, cost, rank in zip(jobs, start_costs, ranks))
+    digest = hashlib.sha256(repr((CACHE_VERSION, entries)).encode('utf-8'))
+    return digest.hexdigest()
+
+class SolutionCache:
+    """
+    On-disk store of the best route found per sequencing problem (see problem_key).
+
+    One pickle file per problem in cache_dir, written atomically so several worker
+    processes can share it. A file's mtime is its last use: beyond max_entries files,
+    the least recently used ones are removed.
+    """
+    def __init__(self, cache_dir, max_entries=MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """Returns the cached route (list of (Item_Code, Layer)) of a problem, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+            os.utime(path) # Mark as recently used
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if data.get('version') != CACHE_VERSION:
+            return None
+        return data.get('route')
+
+    def put(self, key, route):
+        """Stores the route of a problem (the caller only stores improvements)."""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': CACHE_VERSION, 'route': route}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            self._evict()
+        except OSError as e:
+            print(f"Warning: Could not save solution cache entry in {self.cache_dir}: {e}")
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.pkl'):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    entries.append((os.stat(path).st_mtime_ns, path))
+                except OSError:
+                    continue
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+import feeder_model
+
+def random_sets(rng, count, pool_size, max_size):
+    pool = [f"M{m:03d}" for m in range(pool_size)]
+    return [set(rng.sample(pool, rng.randint(1, min(max_size, pool_size)))) for _ in range(count)]
+
+def test_move_cost_matches_full_simulation():
+    rng = random.Random(0)
+    for _ in range(200):
+        sets = random_sets(rng, rng.randint(2, 25), rng.randint(4, 40), 10)
+        slots = rng.randint(2, 30)
+        feeder = feeder_model.LineFeeder(sets, slots)
+        assert feeder.total == sum(feeder_model.simulate_feeder(sets, slots)[0])
+        for _ in range(5):
+            a, b = rng.randrange(len(sets)), rng.randrange(len(sets))
+            moved = sets[:a] + sets[a + 1:]
+            moved.insert(b, sets[a])
+            assert feeder.move_cost(a, b) == sum(feeder_model.simulate_feeder(moved, slots)[0])
+
+def test_improve_keeps_jobs_in_their_blocks():
+    rng = random.Random(1)
+    sets = random_sets(rng, 30, 40, 10)
+    jobs = [{'Item_Code': f'I{i}', 'Individual_Set': mats} for i, mats in enumerate(sets)]
+    # Block 'B' splits the 'A' jobs in two runs that must not mix
+    block_keys = ['A'] * 12 + ['B'] * 3 + ['A'] * 15
+    before = feeder_model.sequence_feeder_cost(jobs, 12)
+
+    result = feeder_model.improve_feeder_sequence(jobs, 12, block_keys=block_keys, time_limit=5.0)
+
+    block_of = {job['Item_Code']: key for job, key in zip(jobs, block_keys)}
+    run_of = {job['Item_Code']: i // 12 if i < 15 else 2 for i, job in enumerate(jobs)}
+    assert [block_of[job['Item_Code']] for job in result] == block_keys
+    assert [run_of[job['Item_Code']] for job in result] == [run_of[job['Item_Code']] for job in jobs]
+    assert feeder_model.sequence_feeder_cost(result, 12) <= before
+
+def test_parse_feeder_slots():
+    assert feeder_model.parse_feeder_slots("") is None
+    assert feeder_model.parse_feeder_slots("120") == 120
+    assert feeder_model.parse_feeder_slots("S01:120, S02:100,*:80") == {'S01': 120, 'S02': 100, '*': 80}
+
+@pytest.mark.parametrize('text', ["S01:120,S02", "S01:120:5", ":120", "S01:x", "S01:0", "S01:-5", "0", "abc"])
+def test_parse_feeder_slots_rejects_malformed_entries(text):
+    with pytest.raises(ValueError, match="Invalid feeder slot entry"):
+        feeder_model.parse_feeder_slots(text)
+
+def test_slots_for_line_needs_listed_line_or_default():
+    assert feeder_model.slots_for_line({'S01': 10, '*': 50}, 'S03') == 50
+    with pytest.raises(ValueError, match="S03"):
+        feeder_model.slots_for_line({'S01': 10, 'S02': 200}, 'S03')
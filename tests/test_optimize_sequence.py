@@ -0,0 +1,38 @@
+import pytest
+
+import optimize_sequence
+
+def make_jobs(count, minutes, materials=('M1',)):
+    return [{'Item_Code': f'ITEM{i}', 'Layer': 'Top', 'Prod_Time': str(minutes),
+             'Individual_Set': set(materials)} for i in range(count)]
+
+@pytest.mark.skipif(not optimize_sequence.ORTOOLS_AVAILABLE, reason="OR-Tools not installed")
+@pytest.mark.parametrize('balance_weight', [0, 1, 5])
+def test_hard_cutoff_keeps_jobs_that_fit(balance_weight):
+    # Four 10-minute jobs fit a 60-minute shift: none may be deferred, whatever the span cost
+    settings = optimize_sequence.SolverSettings(max_seconds=1.0, stall_seconds=0.2, shift_minutes=60,
+                                                shift_cutoff='hard', balance_weight=balance_weight)
+    routes, deferred = optimize_sequence.solve_multi_line(make_jobs(4, 10), ['S01'], settings)
+    assert deferred == []
+    assert sorted(routes['S01']) == [0, 1, 2, 3]
+
+@pytest.mark.skipif(not optimize_sequence.ORTOOLS_AVAILABLE, reason="OR-Tools not installed")
+def test_hard_cutoff_defers_jobs_past_the_shift():
+    settings = optimize_sequence.SolverSettings(max_seconds=1.0, stall_seconds=0.2, shift_minutes=60,
+                                                shift_cutoff='hard')
+    routes, deferred = optimize_sequence.solve_multi_line(make_jobs(4, 25), ['S01'], settings)
+    assert len(routes['S01']) == 2
+    assert len(deferred) == 2
+
+@pytest.mark.parametrize('lines, shift_cutoff', [(['S01', 'S02'], None), (None, 'hard')])
+def test_previous_sequence_rejects_unsupported_options(lines, shift_cutoff):
+    jobs = make_jobs(3, 10)
+    previous = [(job['Item_Code'], job['Layer']) for job in jobs]
+    settings = optimize_sequence.SolverSettings(solver='heuristic', shift_cutoff=shift_cutoff)
+    with pytest.raises(ValueError):
+        optimize_sequence.sequence_jobs(jobs, settings=settings, lines=lines, previous_keys=previous)
+
+def test_feeder_slots_must_cover_every_line():
+    settings = optimize_sequence.SolverSettings(solver='heuristic', feeder_slots={'S01': 10})
+    with pytest.raises(ValueError, match="S02"):
+        optimize_sequence.sequence_jobs(make_jobs(3, 10), settings=settings, lines=['S01', 'S02'])
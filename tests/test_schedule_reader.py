@@ -0,0 +1,62 @@
+import datetime
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import schedule_reader
+
+ROWS = [
+    ('Item Code', 'Layer', 'Name', 'Note', 'Qty', datetime.datetime(2025, 1, 2), datetime.datetime(2025, 1, 3)),
+    ('A1', 'T', 'x', None, 1, 5, None),
+    ('A2', 'B', None, 'n/a', None, None, 3.5),
+    ('A3', 'T', 'z', 'late', 3.5, 7, 2),
+]
+
+def mixed_rows():
+    # Numbers and text in one column (as in the Array column) have no Arrow type
+    df, date_cols = schedule_reader.parse_schedule(iter(row[:2] + (n,) + row[3:] for row, n in
+                                                        zip(ROWS, ['Array', 12, '30,20', None])))
+    assert df['Array'].dtype == object
+    return df, date_cols
+
+def object_rows():
+    # An object column (text and missing cells) that still has an Arrow type
+    df, date_cols = schedule_reader.parse_schedule(iter(ROWS))
+    df['Note'] = df['Note'].astype(object)
+    return df, date_cols
+
+@pytest.mark.parametrize('use_pyarrow', [False, True])
+def test_snapshot_round_trip(tmp_path, monkeypatch, use_pyarrow):
+    if use_pyarrow and not schedule_reader.PYARROW_AVAILABLE:
+        pytest.skip("pyarrow not installed")
+    monkeypatch.setattr(schedule_reader, 'PYARROW_AVAILABLE', use_pyarrow)
+    store = schedule_reader.SnapshotStore(str(tmp_path))
+    for name, (df, date_cols) in [('parsed', schedule_reader.parse_schedule(iter(ROWS))), ('object', object_rows()),
+                                   ('mixed', mixed_rows())]:
+        store.save(name, df, date_cols)
+        assert (tmp_path / f"{name}.{'feather' if use_pyarrow else 'pkl'}").exists()
+        loaded_df, loaded_date_cols = store.load(name)
+        pd.testing.assert_frame_equal(loaded_df, df)
+        assert loaded_date_cols == date_cols
+
+def write_workbook(path, rows):
+    workbook = openpyxl.Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    workbook.save(path)
+
+def test_open_schedule_baseline_per_workbook(tmp_path):
+    first, second = tmp_path / "a.xlsx", tmp_path / "b.xlsx"
+    write_workbook(first, ROWS)
+    write_workbook(second, ROWS[:2])
+
+    df, _, baseline = schedule_reader.open_schedule(str(first))
+    assert baseline is None
+    schedule_reader.open_schedule(str(second))
+
+    # A new version of the first workbook is compared with its own previous version
+    write_workbook(first, ROWS[:3])
+    schedule_reader._cache.clear()
+    _, _, baseline = schedule_reader.open_schedule(str(first))
+    pd.testing.assert_frame_equal(baseline, df)